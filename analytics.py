@@ -0,0 +1,149 @@
+import os
+
+import numpy as np
+import scipy.sparse
+
+from graph_core import MutualGraph
+from output_writer import write_json
+
+ANALYTICS_DIR = "analytics"
+# Neighbours kept per node in the written files
+ANALYTICS_TOP_K = 10
+# Most nonzeros of one block of the users x users product, about 50 MB
+COMEMBER_BLOCK_NONZEROS = 1 << 22
+
+
+def incidence_from_graph(graph: MutualGraph) -> scipy.sparse.csr_matrix:
+    """Users x servers 0/1 matrix: crawled server memberships plus each member's mutual servers."""
+    members = graph.members
+    mutual_servers = graph.mutual_servers
+    member_servers = np.repeat(
+        np.arange(len(members), dtype=np.int64), np.diff(np.frombuffer(members.indptr, dtype=np.int64))
+    )
+    mutual_users = np.repeat(
+        np.arange(len(mutual_servers), dtype=np.int64),
+        np.diff(np.frombuffer(mutual_servers.indptr, dtype=np.int64)),
+    )
+    users = np.concatenate([np.frombuffer(members.indices, dtype=np.uint32), mutual_users])
+    servers = np.concatenate([member_servers, np.frombuffer(mutual_servers.indices, dtype=np.uint32)])
+    incidence = scipy.sparse.csr_matrix(
+        (np.ones(len(users), dtype=np.float64), (users, servers)),
+        shape=(graph.user_count, graph.server_count),
+    )
+    # Duplicate (user, server) pairs were summed
+    incidence.data[:] = 1
+    return incidence
+
+
+def incidence_from_bundle(bundle) -> scipy.sparse.csr_matrix:
+    """Users x servers 0/1 matrix of a dashboard bundle's user -> server adjacency."""
+    user_count = bundle.user_count
+    edge_count = int(bundle.indptr[user_count])
+    return scipy.sparse.csr_matrix(
+        (
+            np.ones(edge_count, dtype=np.float64),
+            bundle.indices[:edge_count].astype(np.int64) - user_count,
+            np.asarray(bundle.indptr[:user_count + 1]),
+        ),
+        shape=(user_count, len(bundle.ids) - user_count),
+    )
+
+
+def server_overlap(incidence: scipy.sparse.csr_matrix) -> scipy.sparse.csr_matrix:
+    """Servers x servers shared member counts; the diagonal holds each server's member count."""
+    return (incidence.T @ incidence).tocsr()
+
+
+def jaccard(overlap: scipy.sparse.csr_matrix) -> scipy.sparse.csr_matrix:
+    """Jaccard similarity |A & B| / |A | B| for every nonzero of a ``server_overlap`` matrix."""
+    sizes = overlap.diagonal()
+    coo = overlap.tocoo()
+    similarity = coo.data / (sizes[coo.row] + sizes[coo.col] - coo.data)
+    return scipy.sparse.csr_matrix((similarity, (coo.row, coo.col)), shape=overlap.shape)
+
+
+def top_k(matrix: scipy.sparse.csr_matrix, k: int, exclude=None) -> list:
+    """Per row, ``(columns, values)`` of the ``k`` largest entries, largest first.
+
+    ``exclude`` gives a column to skip in each row, by default the diagonal, so
+    a node's similarity to itself is left out. Ties are broken by column.
+    """
+    exclude = np.arange(matrix.shape[0]) if exclude is None else exclude
+    result = []
+    for row in range(matrix.shape[0]):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        columns = matrix.indices[start:end]
+        values = matrix.data[start:end]
+        keep = columns != exclude[row]
+        columns, values = columns[keep], values[keep]
+        if len(values) > k:
+            # Everything tied with the k-th largest value stays a candidate for the tie break
+            threshold = np.partition(values, len(values) - k)[len(values) - k]
+            candidates = values >= threshold
+            columns, values = columns[candidates], values[candidates]
+        order = np.lexsort((columns, -values))[:k]
+        result.append((columns[order], values[order]))
+    return result
+
+
+def top_similar_servers(incidence: scipy.sparse.csr_matrix, k: int) -> list:
+    """Per server, the ``k`` servers with the highest Jaccard similarity and their shared member counts."""
+    overlap = server_overlap(incidence)
+    similarity = jaccard(overlap)
+    return [
+        (servers, scores, np.asarray(overlap[np.full(len(servers), server), servers]).ravel())
+        for server, (servers, scores) in enumerate(top_k(similarity, k))
+    ]
+
+
+def top_comembers(
+    incidence: scipy.sparse.csr_matrix, k: int, rows=None, max_nonzeros: int = COMEMBER_BLOCK_NONZEROS
+) -> list:
+    """Per user, the ``k`` users they share the most servers with.
+
+    ``incidence @ incidence.T`` is formed a block of users at a time, each
+    block holding at most about ``max_nonzeros`` entries, so the users x users
+    matrix is never held in memory even when large servers make it dense.
+    ``rows`` limits the result to those users.
+    """
+    rows = np.arange(incidence.shape[0]) if rows is None else np.asarray(rows)
+    transposed = incidence.T.tocsr()
+    # A user's row of the product has at most the summed sizes of their servers as nonzeros
+    fanout = np.cumsum(incidence[rows] @ np.diff(transposed.indptr).astype(np.int64))
+    result = []
+    start = 0
+    while start < len(rows):
+        done = fanout[start - 1] if start else 0
+        # At least one user per block, however large their servers
+        end = max(int(np.searchsorted(fanout, done + max_nonzeros, side="right")), start + 1)
+        block_rows = rows[start:end]
+        shared = (incidence[block_rows] @ transposed).tocsr()
+        result.extend(top_k(shared, k, exclude=block_rows))
+        start = end
+    return result
+
+
+def write_analytics(graph: MutualGraph, path: str, k: int = ANALYTICS_TOP_K, compression=None, compact=False) -> list:
+    """Write the top-``k`` server overlaps and user co-memberships into ``path/analytics``."""
+    incidence = incidence_from_graph(graph)
+    os.makedirs(os.path.join(path, ANALYTICS_DIR), exist_ok=True)
+
+    servers = {
+        graph.server_id(server): [
+            {"id": graph.server_id(other), "shared_members": int(shared), "jaccard": round(float(score), 4)}
+            for other, score, shared in zip(others, scores, shared_counts)
+        ]
+        for server, (others, scores, shared_counts) in enumerate(top_similar_servers(incidence, k))
+    }
+    users = {
+        graph.user_id(user): [
+            {"id": graph.user_id(other), "shared_servers": int(shared)}
+            for other, shared in zip(others, shared_counts)
+        ]
+        for user, (others, shared_counts) in enumerate(top_comembers(incidence, k))
+        if len(others)
+    }
+    return [
+        write_json(servers, os.path.join(path, ANALYTICS_DIR, "server_overlap.json"), compression, compact),
+        write_json(users, os.path.join(path, ANALYTICS_DIR, "user_comembership.json"), compression, compact),
+    ]
@@ -0,0 +1,180 @@
+// Node selection and info panel rendering, run in the browser.
+//
+// The page embeds the dashboard bundle's adjacency (see web_ui.client_graph_data),
+// so a click is answered without a round trip to the Dash server. Element
+// positions follow dashboard.create_graph_elements: one node per bundle row,
+// then the "Me" node, then the membership edges in CSR order, then one
+// connection edge per server. The member clusters of the level-of-detail view
+// come after those and are not addressed.
+//
+// In the level-of-detail view the embedded graph holds only the members drawn
+// so far; memberCounts always has every server's full member count.
+
+function htmlComponent(type, children, style) {
+    return {namespace: "dash_html_components", type: type, props: {children: children, style: style}};
+}
+
+function heading(text, color) {
+    return htmlComponent("H3", text, {
+        margin: "0 0 1rem 0",
+        color: color,
+        fontSize: "1.125rem",
+        fontWeight: "600",
+    });
+}
+
+function subheading(text) {
+    return htmlComponent("H4", text, {
+        margin: "0 0 0.75rem 0",
+        color: "#f9fafb",
+        fontSize: "1rem",
+        fontWeight: "600",
+    });
+}
+
+function statLine(text, margin) {
+    return htmlComponent("P", text, {margin: margin, color: "#9ca3af", fontSize: "0.875rem"});
+}
+
+function guide() {
+    return [
+        heading("Guide", "#f9fafb"),
+        htmlComponent("Div", [
+            statLine("Click any node to see connections", "0 0 0.75rem 0"),
+            htmlComponent("P", "Blue = Users",
+                {margin: "0 0 0.5rem 0", color: "#3b82f6", fontSize: "0.875rem", fontWeight: "500"}),
+            htmlComponent("P", "Green = Servers",
+                {margin: "0 0 0.5rem 0", color: "#10b981", fontSize: "0.875rem", fontWeight: "500"}),
+            htmlComponent("P", "Red = You",
+                {margin: "0 0 1rem 0", color: "#ef4444", fontSize: "0.875rem", fontWeight: "500"}),
+        ]),
+        htmlComponent("Hr", null, {border: "none", borderTop: "1px solid #374151", margin: "1rem 0"}),
+    ];
+}
+
+function statsPanel(graph) {
+    return guide().concat([
+        subheading("Stats"),
+        statLine("Users: " + graph.stats.users, "0 0 0.5rem 0"),
+        statLine("Servers: " + graph.stats.servers, "0 0 0.5rem 0"),
+        statLine("Connections: " + graph.stats.connections, "0"),
+    ]);
+}
+
+// The servers, members and pages of them below the panel come from the Dash server (web_ui.update_node_list)
+function serversPanel(graph) {
+    return guide().concat([subheading("Servers")]);
+}
+
+function countLine(text) {
+    return htmlComponent("P", text,
+        {margin: "0 0 0.75rem 0", color: "#f9fafb", fontSize: "0.875rem", fontWeight: "500"});
+}
+
+var nodeRows = new WeakMap();
+
+function nodeRow(graph, nodeId) {
+    var rows = nodeRows.get(graph);
+    if (!rows) {
+        rows = new Map(graph.ids.map(function (id, row) { return [id, row]; }));
+        nodeRows.set(graph, rows);
+    }
+    return rows.get(nodeId);
+}
+
+// Element classes for the selection, keyed by element index, and the info panel
+function selection(graph, node) {
+    var nodeCount = graph.labels.length;
+    var meIndex = nodeCount;
+    var edgeBase = nodeCount + 1;
+    var connectionBase = edgeBase + graph.indices.length - graph.userCount;
+    var classes = {};
+    var panel;
+    var row, start, end, k;
+
+    if (node.group === "user") {
+        row = nodeRow(graph, node.id);
+        start = graph.indptr[row];
+        end = graph.indptr[row + 1];
+        for (k = start; k < end; k++) {
+            classes[graph.indices[k]] = "connected-node";
+            classes[edgeBase + k] = "highlighted-edge";
+        }
+        classes[row] = "highlighted-node";
+        panel = [
+            heading(node.label, "#3b82f6"),
+            countLine("Member of " + (end - start) + " servers:"),
+        ];
+    } else if (node.group === "server") {
+        row = nodeRow(graph, node.id);
+        var server = row - graph.userCount;
+        start = graph.memberIndptr[server];
+        end = graph.memberIndptr[server + 1];
+        for (k = start; k < end; k++) {
+            classes[graph.members[k]] = "connected-node";
+            classes[edgeBase + graph.memberEdges[k]] = "highlighted-edge";
+        }
+        classes[meIndex] = "connected-node";
+        classes[connectionBase + row] = "highlighted-edge";
+        classes[row] = "highlighted-node";
+        panel = [
+            heading(node.label, "#10b981"),
+            countLine(graph.memberCounts[server] + " members:"),
+        ];
+    } else {
+        for (row = graph.userCount; row < nodeCount; row++) {
+            classes[row] = "connected-node";
+            classes[connectionBase + row] = "highlighted-edge";
+        }
+        classes[meIndex] = "highlighted-node";
+        panel = [
+            heading("You", "#ef4444"),
+            htmlComponent("P",
+                "Connected to " + graph.stats.users + " users through " + graph.stats.servers + " servers",
+                {margin: "0 0 0.75rem 0", color: "#f9fafb", fontSize: "0.875rem"}),
+            htmlComponent("P", "Your network reach in Discord",
+                {margin: "0", color: "#9ca3af", fontSize: "0.875rem", fontStyle: "italic"}),
+        ];
+    }
+    return {classes: classes, panel: panel};
+}
+
+// Patch the classes of the changed elements only, clearing the previous highlight
+function highlight(previous, classes) {
+    var patch = new window.dash_clientside.Patch();
+    (previous || []).forEach(function (index) {
+        if (!(index in classes)) {
+            patch.assign([index, "classes"], "");
+        }
+    });
+    var indices = Object.keys(classes).map(Number);
+    indices.forEach(function (index) {
+        patch.assign([index, "classes"], classes[index]);
+    });
+    return [patch.build(), indices];
+}
+
+window.dash_clientside = window.dash_clientside || {};
+window.dash_clientside.discord_graph = {
+    selectNode: function (tapNodeData, nClicks, graph, highlighted) {
+        var context = window.dash_clientside.callback_context;
+        var triggeredIds = context ? context.triggered.map(function (item) { return item.prop_id; }) : [];
+        var triggered = triggeredIds.length ? triggeredIds[0] : "";
+        // Expanding a level-of-detail view replaces the elements, so nothing is highlighted any more
+        if (triggeredIds.indexOf("graph-data.data") !== -1) {
+            highlighted = [];
+        }
+
+        if (triggered.indexOf("deselect-button") === 0) {
+            return [graph.stylesheet, statsPanel(graph)].concat(highlight(highlighted, {}));
+        }
+        if (!tapNodeData) {
+            return [graph.stylesheet, serversPanel(graph)].concat(highlight(highlighted, {}));
+        }
+        if (tapNodeData.group === "cluster") {
+            tapNodeData = {id: tapNodeData.server, group: "server", label: graph.labels[nodeRow(graph, tapNodeData.server)]};
+        }
+        var selected = selection(graph, tapNodeData);
+        return [graph.selectionStylesheet, selected.panel].concat(highlight(highlighted, selected.classes));
+    },
+};
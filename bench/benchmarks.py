@@ -0,0 +1,244 @@
+import argparse
+import gc
+import json
+import logging
+import os
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import web_ui
+from dashboard import create_graph_elements
+from main import MyClient
+from bench.synthetic import synthetic_graph
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+
+
+class Context:
+    """Inputs shared by the benchmarks of one graph size, each built on first use."""
+
+    def __init__(self, member_count: int, seed: int, output_path: str):
+        self.member_count = member_count
+        self.seed = seed
+        self.output_path = output_path
+        self._values = {}
+
+    def get(self, name: str):
+        if name not in self._values:
+            self._values[name] = getattr(self, "_" + name)()
+        return self._values[name]
+
+    def _graph(self):
+        return synthetic_graph(self.member_count, self.seed)
+
+    def _client(self):
+        return MyClient(
+            sleep_time=0,
+            output_verbosity=2,
+            print_info=False,
+            write_to_json=True,
+            output_path=self.output_path,
+            include_servers=[],
+            include_channels=[],
+            max_members=self.member_count,
+            period_max_members=100,
+            pause_duration=0,
+            show_mutual_server_graph=False,
+            low_memory=True,
+        )
+
+    def _outputs(self):
+        graph, client = self.get("graph"), self.get("client")
+        return (
+            graph.to_server_info(),
+            client.get_friends(graph),
+            client.get_mutual_friends(graph, client.output_verbosity),
+            client.get_mutual_servers(graph, client.output_verbosity),
+            graph.to_names(),
+        )
+
+    def _bundle(self):
+        return web_ui.build_bundle(self.get("graph"))
+
+    def _app(self):
+        return web_ui.create_app(self.get("bundle"))
+
+    def _server(self):
+        return self.get("app").server.test_client()
+
+    def _tap(self):
+        # The largest server, the most expensive node to select
+        bundle = self.get("bundle")
+        row = bundle.user_count + int(bundle.server_user_counts().argmax())
+        return {"id": bundle.ids[row], "label": bundle.labels[row], "group": "server"}
+
+
+def dependency(output) -> dict:
+    return {"id": output.component_id, "property": output.component_property}
+
+
+def run_callback(app, client, output: str, *args):
+    """Post the Dash callback writing ``output`` to the app's update endpoint, as the browser does after a node tap.
+
+    ``args`` are the callback's input values followed by its state values.
+    Returns the decoded response, or None when the callback prevented the update.
+    """
+    key, callback = next((key, value) for key, value in app.callback_map.items() if output in key)
+    inputs, state, outputs = callback["inputs"], callback["state"], callback["output"]
+    response = client.post(
+        "/_dash-update-component",
+        json={
+            "output": key,
+            "outputs": [dependency(o) for o in outputs] if isinstance(outputs, list) else dependency(outputs),
+            "inputs": [dict(d, value=value) for d, value in zip(inputs, args)],
+            "state": [dict(d, value=value) for d, value in zip(state, args[len(inputs):])],
+            "changedPropIds": ["discord-graph.tapNodeData"],
+        },
+    )
+    if response.status_code == 204:
+        return None
+    if response.status_code != 200:
+        raise RuntimeError(f"Callback {key} failed with {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return response.get_json()
+
+
+def click(context: Context):
+    app, client, tap = context.get("app"), context.get("server"), context.get("tap")
+    state = {"kind": None, "id": None, "page": 0}
+    run_callback(app, client, "node-list.children", tap, 0, "", 0, 0, state)
+    run_callback(app, client, "node-analytics.children", tap, 0)
+    if any("graph-data.data" in key for key in app.callback_map):
+        run_callback(app, client, "graph-data.data", tap, None)
+
+
+BENCHMARKS = {
+    "get_mutual_friends": lambda c: c.get("client").get_mutual_friends(c.get("graph"), 2),
+    "get_mutual_servers": lambda c: c.get("client").get_mutual_servers(c.get("graph"), 2),
+    "write_data_to_json": lambda c: c.get("client").write_data_to_json(*c.get("outputs"), c.output_path),
+    "remap_servers_to_adjacency_matrix": lambda c: web_ui.remap_servers_to_adjacency_matrix(c.get("graph")),
+    "build_bundle": lambda c: web_ui.build_bundle(c.get("graph")),
+    "create_graph_elements": lambda c: create_graph_elements(c.get("bundle")),
+    "create_app": lambda c: web_ui.create_app(c.get("bundle")),
+    "click": click,
+}
+# Inputs each benchmark needs built before it is timed
+REQUIRES = {
+    "get_mutual_friends": ("graph", "client"),
+    "get_mutual_servers": ("graph", "client"),
+    "write_data_to_json": ("outputs",),
+    "remap_servers_to_adjacency_matrix": ("graph",),
+    "build_bundle": ("graph",),
+    "create_graph_elements": ("bundle",),
+    "create_app": ("bundle",),
+    "click": ("app", "server", "tap"),
+}
+
+
+def measure(benchmark, context: Context, repeat: int):
+    """Best wall time over ``repeat`` runs, and the peak memory allocated by one more traced run."""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        benchmark(context)
+        times.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    benchmark(context)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times), peak
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes, names, seed: int = 0, repeat: int = 3) -> list:
+    results = []
+    with tempfile.TemporaryDirectory() as output_path:
+        for member_count in sizes:
+            context = Context(member_count, seed, output_path)
+            for name in names:
+                for requirement in REQUIRES[name]:
+                    context.get(requirement)
+                seconds, peak = measure(BENCHMARKS[name], context, repeat)
+                result = {"benchmark": name, "members": member_count, "seconds": seconds, "peak_bytes": peak}
+                print(format_result(result), flush=True)
+                results.append(result)
+    return results
+
+
+def format_result(result: dict, baseline: dict = None) -> str:
+    line = (
+        f"{result['benchmark']:<36}{result['members']:>10}"
+        f"{result['seconds']:>12.4f}s{result['peak_bytes'] / 2 ** 20:>12.1f} MiB"
+    )
+    if baseline:
+        line += (
+            f"{result['seconds'] / max(baseline['seconds'], 1e-9):>9.2f}x time"
+            f"{result['peak_bytes'] / max(baseline['peak_bytes'], 1):>9.2f}x memory"
+        )
+    return line
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time the crawl output and dashboard hot paths on seeded synthetic graphs."
+    )
+    parser.add_argument(
+        "--members",
+        nargs="+",
+        type=int,
+        default=list(DEFAULT_SIZES),
+        help="Graph sizes, in members, to benchmark. Example --members 1000 1000000, default=1000 10000 100000",
+    )
+    parser.add_argument(
+        "--benchmarks",
+        nargs="+",
+        choices=list(BENCHMARKS),
+        default=list(BENCHMARKS),
+        help="Benchmarks to run. Example --benchmarks get_mutual_friends click, default=all",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic graphs. Example --seed 1, default=0")
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Timed runs per benchmark; the best is reported. Example --repeat 5, default=3"
+    )
+    parser.add_argument(
+        "--output",
+        help="Write the results, with the commit they were measured at, to this JSON file. Example --output bench_output.json",
+    )
+    parser.add_argument(
+        "--compare",
+        help="A JSON file written by --output; each result is shown relative to the matching one in it. Example --compare baseline.json",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    results = run_benchmarks(args.members, args.benchmarks, args.seed, args.repeat)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline["seed"] != args.seed:
+            logging.warning(f"{args.compare} was measured with seed {baseline['seed']}, not {args.seed}")
+        previous = {(result["benchmark"], result["members"]): result for result in baseline["results"]}
+        print(f"\nCompared to {baseline.get('commit') or args.compare}:")
+        for result in results:
+            print(format_result(result, previous.get((result["benchmark"], result["members"]))))
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({"commit": git_commit(), "seed": args.seed, "results": results}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
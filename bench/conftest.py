@@ -0,0 +1,29 @@
+import discord.http
+import pytest
+
+import main as client_main
+from bench.mock_api import MockDiscordAPI, make_client
+from bench.synthetic import synthetic_graph
+
+
+@pytest.fixture
+def mock_api(request, monkeypatch):
+    """A running ``MockDiscordAPI`` that the Discord library and ``get_user_guilds_fast`` are pointed at.
+
+    Parametrize indirectly with ``MockDiscordAPI`` options, plus ``members``
+    for the size of the synthetic graph, e.g.
+    ``@pytest.mark.parametrize("mock_api", [{"members": 500, "rate_limit_rate": 0.1}], indirect=True)``.
+    """
+    options = dict(getattr(request, "param", {}))
+    api = MockDiscordAPI(synthetic_graph(options.pop("members", 1000), options.get("seed", 0)), **options)
+    base_url = api.start_in_thread()
+    monkeypatch.setattr(discord.http.Route, "BASE", base_url)
+    monkeypatch.setattr(client_main, "DISCORD_API_BASE", base_url)
+    yield api
+    api.stop_thread()
+
+
+@pytest.fixture
+def mock_client(mock_api, tmp_path):
+    """A ``MyClient`` writing to a temporary directory; run its crawl with ``asyncio.run(bench.mock_api.crawl(client))``."""
+    return make_client(str(tmp_path))
@@ -0,0 +1,366 @@
+import argparse
+import asyncio
+import bisect
+import json
+import logging
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import discord
+import discord.http
+from aiohttp import web
+
+import main as client_main
+from graph_core import MutualGraph
+from profile_cache import ProfileCache
+from bench.synthetic import synthetic_graph
+
+API_PREFIX = "/api/v9"
+MOCK_TOKEN = "mock-token"
+# The crawling account; not a member of the synthetic graph
+SELF_ID = 1
+MEMBER_PAGE_SIZE = 1000
+UNKNOWN_GUILD = {"message": "Unknown Guild", "code": 10004}
+
+
+def _json_response(data, status: int = 200, headers: dict = None) -> web.Response:
+    # Discord sends a bare application/json content type, which the library matches exactly
+    return web.Response(
+        body=json.dumps(data).encode(), status=status, headers={"Content-Type": "application/json", **(headers or {})}
+    )
+
+
+def _user_payload(user_id, name) -> dict:
+    return {"id": str(user_id), "username": name, "discriminator": "0", "avatar": None, "global_name": None}
+
+
+class MockDiscordAPI:
+    """aiohttp stand-in for the Discord REST endpoints the crawl uses, serving a synthetic graph.
+
+    The account is in every crawled server of ``graph``. Each request waits
+    ``latency`` seconds, then fails with a 500 with probability ``error_rate``
+    or is rate limited with probability ``rate_limit_rate``: a 429 carrying
+    ``retry_after`` in its body and Retry-After header. Faults are drawn from
+    a seeded generator, so a run can be repeated.
+
+    With ``bucket_limit`` set, each route also allows only that many requests
+    per ``bucket_window`` seconds, reports its bucket in X-RateLimit headers
+    like Discord, and answers requests over the limit with a 429.
+    """
+
+    def __init__(
+        self,
+        graph: MutualGraph,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after: float = 0.5,
+        seed: int = 0,
+        bucket_limit: int = None,
+        bucket_window: float = 1.0,
+    ):
+        self.graph = graph
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.bucket_limit = bucket_limit
+        self.bucket_window = bucket_window
+        # Per route: the start of its current window and the requests made in it
+        self._buckets = {}
+        # Served requests per route, and the injected faults
+        self.requests = Counter()
+        self.errors = 0
+        self.rate_limited = 0
+        # Requests refused for exceeding their route's bucket
+        self.over_limit = 0
+        self.base_url = None
+        self._runner = None
+        self._thread = None
+        self._loop = None
+        # Per server: member keys in ascending order, with their user nodes
+        self._members_by_key = {}
+
+        self.app = web.Application(middlewares=[self._faults])
+        self.app.add_routes([
+            web.get(API_PREFIX + "/users/@me", self._me),
+            web.get(API_PREFIX + "/users/@me/guilds", self._guilds),
+            web.get(API_PREFIX + "/guilds/{guild_id}", self._guild),
+            web.get(API_PREFIX + "/guilds/{guild_id}/members", self._members),
+            web.get(API_PREFIX + "/users/{user_id}/profile", self._profile),
+        ])
+
+    @web.middleware
+    async def _faults(self, request, handler):
+        route = request.match_info.route.resource.canonical if request.match_info.route.resource else request.path
+        self.requests[route] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        headers = {}
+        if self.bucket_limit:
+            now = time.monotonic()
+            window_start, used = self._buckets.get(route, (now, 0))
+            if now >= window_start + self.bucket_window:
+                window_start, used = now, 0
+            reset_after = window_start + self.bucket_window - now
+            headers = {
+                "X-RateLimit-Limit": str(self.bucket_limit),
+                "X-RateLimit-Remaining": str(max(self.bucket_limit - used - 1, 0)),
+                "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+                "X-RateLimit-Bucket": route,
+            }
+            if used >= self.bucket_limit:
+                self.over_limit += 1
+                return _json_response(
+                    {"message": "You are being rate limited.", "retry_after": reset_after, "global": False},
+                    status=429,
+                    headers={**headers, "Retry-After": f"{reset_after:.3f}", "X-RateLimit-Scope": "user", "Via": "1.1 google"},
+                )
+            self._buckets[route] = (window_start, used + 1)
+        draw = self.random.random()
+        if draw < self.rate_limit_rate:
+            self.rate_limited += 1
+            return _json_response(
+                {"message": "You are being rate limited.", "retry_after": self.retry_after, "global": False},
+                status=429,
+                headers={"Retry-After": str(self.retry_after), "Via": "1.1 google"},
+            )
+        if draw < self.rate_limit_rate + self.error_rate:
+            self.errors += 1
+            return _json_response({"message": "500: Internal Server Error", "code": 0}, status=500)
+        response = await handler(request)
+        response.headers.update(headers)
+        return response
+
+    def _server(self, request):
+        """The crawled server a guild route refers to, or None."""
+        server = self.graph.find_server(int(request.match_info["guild_id"]))
+        return server if server in self.graph.crawled_servers else None
+
+    def _guild_payload(self, server: int) -> dict:
+        return {
+            "id": self.graph.server_id(server),
+            "name": self.graph.server_names[server],
+            "icon": None,
+            "owner": False,
+            "permissions": "0",
+            "features": [],
+            "member_count": len(self.graph.members[server]),
+        }
+
+    def _member_payload(self, user: int) -> dict:
+        return {
+            "user": _user_payload(self.graph.user_id(user), self.graph.user_names[user]),
+            "roles": [],
+            "joined_at": None,
+            "deaf": False,
+            "mute": False,
+            "flags": 0,
+        }
+
+    async def _me(self, request):
+        return _json_response(dict(_user_payload(SELF_ID, "mock"), bio="", analytics_token=""))
+
+    async def _guilds(self, request):
+        return _json_response([self._guild_payload(server) for server in self.graph.crawled_servers])
+
+    async def _guild(self, request):
+        server = self._server(request)
+        if server is None:
+            return _json_response(UNKNOWN_GUILD, 404)
+        return _json_response(self._guild_payload(server))
+
+    async def _members(self, request):
+        """Members by ascending ID, paged with ``limit`` and ``after`` like the bot endpoint."""
+        server = self._server(request)
+        if server is None:
+            return _json_response(UNKNOWN_GUILD, 404)
+        limit = min(int(request.query.get("limit", 1)), MEMBER_PAGE_SIZE)
+        after = int(request.query.get("after", 0))
+        keys, users = self._sorted_members(server)
+        start = bisect.bisect_right(keys, after)
+        return _json_response([self._member_payload(user) for user in users[start:start + limit]])
+
+    def _sorted_members(self, server: int):
+        if server not in self._members_by_key:
+            members = sorted((self.graph.user_keys[user], user) for user in self.graph.members[server])
+            self._members_by_key[server] = ([key for key, user in members], [user for key, user in members])
+        return self._members_by_key[server]
+
+    def _is_member(self, server: int, key: int) -> bool:
+        keys = self._sorted_members(server)[0]
+        index = bisect.bisect_left(keys, key)
+        return index < len(keys) and keys[index] == key
+
+    async def _profile(self, request):
+        graph = self.graph
+        user = graph.find_user(int(request.match_info["user_id"]))
+        if user is None:
+            return _json_response({"message": "Unknown User", "code": 10013}, 404)
+        data = {
+            "user": dict(_user_payload(graph.user_id(user), graph.user_names[user]), bio=""),
+            "user_profile": {"bio": ""},
+            "connected_accounts": [],
+        }
+        guild_id = request.query.get("guild_id")
+        server = graph.find_server(int(guild_id)) if guild_id else None
+        if server is not None and self._is_member(server, graph.user_keys[user]):
+            data["guild_member"] = {key: value for key, value in self._member_payload(user).items() if key != "user"}
+            data["guild_member_profile"] = {"guild_id": guild_id}
+        if request.query.get("with_mutual_guilds") == "true":
+            data["mutual_guilds"] = [
+                {"id": graph.server_id(server), "nick": None} for server in graph.mutual_servers[user]
+            ]
+        if request.query.get("with_mutual_friends") == "true":
+            data["mutual_friends"] = [
+                _user_payload(graph.user_id(friend), graph.user_names[friend]) for friend in graph.mutual_friends[user]
+            ]
+        return _json_response(data)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve on ``host``; ``port`` 0 picks a free port. Returns the API base URL."""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{port}{API_PREFIX}"
+        return self.base_url
+
+    async def stop(self) -> None:
+        await self._runner.cleanup()
+
+    def start_in_thread(self) -> str:
+        """Serve from a background thread, so the client can run its own event loop."""
+        started = threading.Event()
+
+        def serve():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.start())
+            started.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(self.stop())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=serve, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self.base_url
+
+    def stop_thread(self) -> None:
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+class RestGuild(discord.Guild):
+    """A guild whose member requests, normally made over the gateway, are served by the members endpoint."""
+
+    async def fetch_members(self, channels=None, *, cache: bool = False, **kwargs):
+        return await self.chunk(cache=cache)
+
+    async def chunk(self, *, cache: bool = True):
+        http = self._state.http
+        members, after = [], 0
+        while True:
+            page = await http.request(
+                discord.http.Route("GET", "/guilds/{guild_id}/members", guild_id=self.id),
+                params={"limit": MEMBER_PAGE_SIZE, "after": after},
+            )
+            members.extend(discord.Member(data=data, guild=self, state=self._state) for data in page)
+            if len(page) < MEMBER_PAGE_SIZE:
+                break
+            after = page[-1]["user"]["id"]
+        if cache:
+            for member in members:
+                self._add_member(member)
+        return members
+
+
+def point_client_at(base_url: str) -> None:
+    """Send the Discord library's and ``get_user_guilds_fast``'s requests to ``base_url``."""
+    discord.http.Route.BASE = base_url
+    client_main.DISCORD_API_BASE = base_url
+
+
+async def crawl(client: client_main.MyClient, token: str = MOCK_TOKEN) -> None:
+    """Log in over REST and run the client's ``on_ready`` crawl without a gateway connection.
+
+    The mock serves no gateway, so the guilds the READY event would cache are
+    fetched over REST instead.
+    """
+    await client.login(token)
+    state = client._connection
+    for user_guild in await client.fetch_guilds():
+        data = await client.http.request(discord.http.Route("GET", "/guilds/{guild_id}", guild_id=user_guild.id))
+        state._add_guild(RestGuild(data=data, state=state))
+    await client.on_ready()
+
+
+def make_client(output_path: str, **kwargs) -> client_main.MyClient:
+    options = dict(
+        sleep_time=0,
+        output_verbosity=2,
+        print_info=False,
+        write_to_json=True,
+        output_path=output_path,
+        include_servers=[],
+        include_channels=[],
+        max_members=10 ** 9,
+        period_max_members=100,
+        pause_duration=0,
+        show_mutual_server_graph=False,
+    )
+    options.update(kwargs)
+    return client_main.MyClient(**options)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Crawl a synthetic graph served by the mock Discord API, once with a cold and once with a warm profile cache."
+    )
+    parser.add_argument("--members", type=int, default=1000, help="Members in the synthetic graph. Example --members 5000, default=1000")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the graph and the fault draws. Example --seed 1, default=0")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds each request takes. Example --latency 0.05, default=0")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Share of requests answered with a 500. Example --error_rate 0.01, default=0")
+    parser.add_argument("--rate_limit_rate", type=float, default=0.0, help="Share of requests answered with a 429. Example --rate_limit_rate 0.05, default=0")
+    parser.add_argument("--retry_after", type=float, default=0.5, help="Retry-After of the 429 responses, in seconds. Example --retry_after 1.5, default=0.5")
+    parser.add_argument("--bucket_limit", type=int, help="Requests each route allows per --bucket_window, reported in X-RateLimit headers. Example --bucket_limit 50, default=no limit")
+    parser.add_argument("--bucket_window", type=float, default=1.0, help="Seconds after which a route's bucket resets. Example --bucket_window 5, default=1")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    api = MockDiscordAPI(
+        synthetic_graph(args.members, args.seed),
+        args.latency,
+        args.error_rate,
+        args.rate_limit_rate,
+        args.retry_after,
+        args.seed,
+        args.bucket_limit,
+        args.bucket_window,
+    )
+    point_client_at(api.start_in_thread())
+    with tempfile.TemporaryDirectory() as output_path:
+        cache = ProfileCache(f"{output_path}/profile_cache.sqlite3", 3600)
+        for run in ("cold cache", "warm cache"):
+            api.requests.clear()
+            api.errors = api.rate_limited = api.over_limit = 0
+            client = make_client(output_path, profile_cache=cache)
+            start = time.perf_counter()
+            asyncio.run(crawl(client))
+            seconds = time.perf_counter() - start
+            print(
+                f"{run}: {seconds:.2f}s, {sum(api.requests.values())} requests "
+                f"({api.requests[API_PREFIX + '/users/{user_id}/profile']} profiles), "
+                f"{api.rate_limited} rate limited, {api.over_limit} over the limit, {api.errors} errors"
+            )
+        cache.close()
+    api.stop_thread()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import numpy as np
+
+from graph_core import MutualGraph
+
+# Snowflake-sized IDs so keys look like the ones written by a real crawl
+USER_ID_BASE = 100_000_000_000_000_000
+SERVER_ID_BASE = 900_000_000_000_000_000
+
+
+def _csr(sources: np.ndarray, targets: np.ndarray, rows: int):
+    """Deduplicated ``(sources, targets, indptr)`` edges sorted by source, as ``MutualGraph.from_tables`` takes them."""
+    width = int(targets.max()) + 1 if len(targets) else 1
+    edges = np.unique(sources.astype(np.int64) * width + targets)
+    sources, targets = (edges // width).astype(np.uint32), (edges % width).astype(np.uint32)
+    indptr = np.zeros(rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=rows), out=indptr[1:])
+    return sources, targets, indptr
+
+
+def synthetic_graph(
+    member_count: int,
+    seed: int = 0,
+    server_count: int = None,
+    crawled_count: int = None,
+    friend_fraction: float = 0.02,
+) -> MutualGraph:
+    """A crawl-shaped graph of ``member_count`` members with heavy-tailed degrees.
+
+    Server sizes follow a Zipf law over ``server_count`` servers and the number
+    of servers per member a truncated Zipf law, so a few huge servers and a few
+    members in many servers dominate, as in real crawls. The first
+    ``crawled_count`` servers are the crawled ones; every member belongs to at
+    least one of them. The same arguments always give the same graph.
+    """
+    rng = np.random.default_rng(seed)
+    server_count = server_count or max(10, member_count // 100)
+    crawled_count = min(crawled_count or max(5, server_count // 10), server_count)
+
+    popularity = 1 / np.arange(1, server_count + 1) ** 1.1
+    popularity /= popularity.sum()
+    degrees = np.minimum(rng.zipf(2.0, member_count), 100)
+    users = np.repeat(np.arange(member_count), degrees)
+    servers = rng.choice(server_count, len(users), p=popularity)
+    # Every member was found in at least one crawled server
+    crawled_popularity = popularity[:crawled_count] / popularity[:crawled_count].sum()
+    users = np.concatenate([users, np.arange(member_count)])
+    servers = np.concatenate([servers, rng.choice(crawled_count, member_count, p=crawled_popularity)])
+    mutual_servers = _csr(users, servers, member_count)
+
+    crawled = mutual_servers[1] < crawled_count
+    membership = _csr(mutual_servers[1][crawled], mutual_servers[0][crawled], server_count)
+
+    friends = np.flatnonzero(rng.random(member_count) < friend_fraction)
+    if not len(friends):
+        friends = np.array([0])
+    friend_degrees = np.minimum(rng.zipf(2.5, member_count) - 1, len(friends))
+    friend_users = np.repeat(np.arange(member_count), friend_degrees)
+    friend_targets = friends[rng.integers(0, len(friends), len(friend_users))]
+    distinct = friend_users != friend_targets
+    mutual_friends = _csr(friend_users[distinct], friend_targets[distinct], member_count)
+
+    is_friend = np.zeros(member_count, dtype=np.uint8)
+    is_friend[friends] = 1
+    return MutualGraph.from_tables(
+        (USER_ID_BASE + np.arange(member_count)).tolist(),
+        [f"user{user}" for user in range(member_count)],
+        is_friend,
+        np.ones(member_count, dtype=np.uint8),
+        (SERVER_ID_BASE + np.arange(server_count)).tolist(),
+        [f"server{server}" for server in range(server_count)],
+        np.arange(crawled_count, dtype=np.uint32),
+        (membership, mutual_friends, mutual_servers),
+    )
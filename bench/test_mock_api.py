@@ -0,0 +1,45 @@
+import asyncio
+import json
+
+import pytest
+
+from bench.mock_api import crawl
+
+
+def crawled_server_info(output_path) -> dict:
+    with open(output_path / "server_info.json") as f:
+        server_info = json.load(f)
+    # The mock serves no relationships, so no member is a friend of the account
+    for members in server_info.values():
+        for member in members.values():
+            del member["is_friend"]
+    return server_info
+
+
+def expected_server_info(graph) -> dict:
+    server_info = graph.to_server_info()
+    for members in server_info.values():
+        for member in members.values():
+            del member["is_friend"]
+    return server_info
+
+
+def normalized(server_info: dict) -> dict:
+    return {
+        server: {
+            member: {key: sorted(value) for key, value in data.items()} for member, data in members.items()
+        }
+        for server, members in server_info.items()
+    }
+
+
+@pytest.mark.parametrize(
+    "mock_api",
+    [{"members": 300}, {"members": 300, "rate_limit_rate": 0.05, "retry_after": 0.01}],
+    indirect=True,
+)
+def test_crawl_recovers_the_served_graph(mock_api, mock_client, tmp_path):
+    asyncio.run(crawl(mock_client))
+
+    assert normalized(crawled_server_info(tmp_path)) == normalized(expected_server_info(mock_api.graph))
+    assert mock_client.metrics.counts["profile_fetched"] == mock_api.graph.user_count
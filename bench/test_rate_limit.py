@@ -0,0 +1,83 @@
+import asyncio
+import time
+
+import aiohttp
+import discord
+import discord.http
+import pytest
+
+from bench.mock_api import MOCK_TOKEN, crawl, make_client
+from rate_limit import RateLimitScheduler, with_retries
+
+# Attempts the library makes at a request before it raises
+LIBRARY_TRIES = 5
+
+
+@pytest.mark.parametrize("mock_api", [{"members": 150, "bucket_limit": 25, "bucket_window": 0.25}], indirect=True)
+def test_crawl_stays_within_the_reported_buckets(mock_api, mock_client):
+    asyncio.run(crawl(mock_client))
+
+    assert mock_api.over_limit == 0
+    assert mock_client.metrics.counts["profile_fetched"] == mock_api.graph.user_count
+
+
+@pytest.mark.parametrize("mock_api", [{"members": 10, "bucket_limit": 10, "bucket_window": 0.2}], indirect=True)
+def test_scheduler_alone_paces_requests_to_the_bucket(mock_api):
+    # Without the library's own buckets, only the scheduler keeps the requests within the limit
+    scheduler = RateLimitScheduler()
+    url = mock_api.base_url + "/users/@me"
+    key = scheduler.route_key("GET", url)
+
+    async def run():
+        async with aiohttp.ClientSession() as session:
+            for _ in range(35):
+                await scheduler.acquire(key)
+                async with session.get(url) as response:
+                    scheduler.update(key, response.status, response.headers)
+
+    start = time.monotonic()
+    asyncio.run(run())
+
+    assert mock_api.over_limit == 0
+    # 35 requests at 10 per 0.2 s need three full windows
+    assert time.monotonic() - start >= 0.6
+
+
+@pytest.mark.parametrize("mock_api", [{"members": 30}], indirect=True)
+def test_crawl_falls_back_to_sleep_time_without_the_library_session(mock_api, tmp_path, caplog):
+    sleep_time = 0.01
+    client = make_client(str(tmp_path), sleep_time=sleep_time)
+    attach = client.rate_limiter.attach
+    # An HTTPClient without the name-mangled session, as a changed library version would have
+    client.rate_limiter.attach = lambda http: attach(object())
+
+    asyncio.run(crawl(client))
+
+    assert "Cannot pace requests by the rate limit headers" in caplog.text
+    assert client.fixed_pacing
+    assert client.metrics.counts["profile_fetched"] == mock_api.graph.user_count
+    assert client.metrics.seconds["rate_limit"] >= sleep_time * mock_api.graph.user_count
+
+
+@pytest.mark.parametrize("mock_api", [{"members": 10, "retry_after": 0.01}], indirect=True)
+def test_rate_limited_requests_are_retried_a_bounded_number_of_times(mock_api, mock_client):
+    retries = 2
+
+    async def run():
+        await mock_client.login(MOCK_TOKEN)
+        mock_client.rate_limiter.attach(mock_client.http)
+        mock_api.rate_limit_rate = 1.0
+        try:
+            with pytest.raises(discord.HTTPException) as error:
+                await with_retries(
+                    lambda: mock_client.http.request(discord.http.Route("GET", "/users/@me")), retries=retries
+                )
+        finally:
+            await mock_client.close()
+        return error.value
+
+    error = asyncio.run(run())
+
+    assert error.status == 429
+    assert mock_api.rate_limited == (retries + 1) * LIBRARY_TRIES
+    assert mock_client.metrics.counts["rate_limited"] == mock_api.rate_limited
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from bench.mock_api import crawl, make_client
+from bench.test_mock_api import crawled_server_info, expected_server_info, normalized
+from crawl_journal import CrawlJournal
+from graph_core import MutualGraph
+from main import open_stream_output
+
+# Profiles recorded before the first run is interrupted
+INTERRUPT_AFTER = 120
+
+
+class Interrupted(Exception):
+    pass
+
+
+def interrupt_after(client, fetches: int) -> None:
+    """Make the crawl raise once ``fetches`` profiles have been recorded, as a kill mid-crawl would."""
+    observe_profile = client.metrics.observe_profile
+
+    def interrupting_observe_profile(seconds: float) -> None:
+        if client.metrics.counts["profile_fetched"] >= fetches:
+            raise Interrupted
+        observe_profile(seconds)
+
+    client.metrics.observe_profile = interrupting_observe_profile
+
+
+@pytest.mark.parametrize("mock_api", [{"members": 300}], indirect=True)
+def test_resumed_crawl_finishes_without_refetching(mock_api, tmp_path):
+    journal_path = str(tmp_path / "crawl_journal.jsonl")
+
+    journal = CrawlJournal(journal_path)
+    interrupted = make_client(str(tmp_path), journal=journal)
+    interrupt_after(interrupted, INTERRUPT_AFTER)
+    with pytest.raises(Interrupted):
+        asyncio.run(crawl(interrupted))
+    journal.close()
+
+    journal = CrawlJournal(journal_path, resume=True)
+    resumed = make_client(str(tmp_path), journal=journal)
+    asyncio.run(crawl(resumed))
+
+    assert journal.resume
+    assert journal.completed_servers == journal.started_servers
+    assert len(journal.completed_servers) == len(mock_api.graph.crawled_servers)
+    # Only the members the first run did not record are fetched again
+    assert resumed.metrics.counts["profile_fetched"] == mock_api.graph.user_count - INTERRUPT_AFTER
+    assert normalized(crawled_server_info(tmp_path)) == normalized(expected_server_info(mock_api.graph))
+
+
+@pytest.mark.parametrize("mock_api", [{"members": 300}], indirect=True)
+def test_resumed_stream_holds_records_lost_by_the_interrupted_run(mock_api, tmp_path):
+    journal_path = str(tmp_path / "crawl_journal.jsonl")
+
+    journal = CrawlJournal(journal_path)
+    stream_output = open_stream_output(str(tmp_path), None, journal)
+    interrupted = make_client(str(tmp_path), journal=journal, stream_output=stream_output, output_format="jsonl")
+    interrupt_after(interrupted, INTERRUPT_AFTER)
+    with pytest.raises(Interrupted):
+        asyncio.run(crawl(interrupted))
+    journal.close()
+    stream_output.close()
+    # A hard kill loses whatever was still buffered, here all of it
+    open(stream_output.path, "w").close()
+
+    journal = CrawlJournal(journal_path, resume=True)
+    stream_output = open_stream_output(str(tmp_path), None, journal)
+    resumed = make_client(str(tmp_path), journal=journal, stream_output=stream_output, output_format="jsonl")
+    asyncio.run(crawl(resumed))
+
+    streamed = MutualGraph.from_file(str(tmp_path / "server_info.jsonl")).to_server_info()
+    for members in streamed.values():
+        for member in members.values():
+            del member["is_friend"]
+    assert normalized(streamed) == normalized(expected_server_info(mock_api.graph))
@@ -0,0 +1,115 @@
+import pytest
+
+from bench.synthetic import USER_ID_BASE, synthetic_graph
+from graph_core import MutualGraph
+from snapshot_diff import changed_users, diff_graphs
+
+MEMBERS = 300
+# Only in the old crawl, a member of one crawled server
+REMOVED_USER = USER_ID_BASE + MEMBERS
+# Only in the new crawl, a member of one crawled server with one mutual friend
+ADDED_USER = USER_ID_BASE + MEMBERS + 1
+
+
+def edge_ids(graph: MutualGraph) -> tuple:
+    """The membership, mutual friend and mutual server edges as sets of ``(source, target)`` ID pairs."""
+    users, servers = graph.user_keys, graph.server_keys
+    return (
+        {(servers[server], users[user]) for server in range(graph.server_count) for user in graph.members[server]},
+        {(users[user], users[friend]) for user in range(graph.user_count) for friend in graph.mutual_friends[user]},
+        {(users[user], servers[server]) for user in range(graph.user_count) for server in graph.mutual_servers[user]},
+    )
+
+
+def build_graph(users: list, servers: list, crawled: list, edges: tuple, key) -> MutualGraph:
+    """A graph of the given IDs, interned in the given order with each ID mapped through ``key``."""
+    graph = MutualGraph()
+    for user in users:
+        graph.intern_user(key(user))
+    for server in servers:
+        graph.intern_server(key(server))
+    for server in crawled:
+        graph.add_crawled_server(key(server))
+    membership, mutual_friends, mutual_servers = edges
+    for server, user in sorted(membership):
+        graph.add_member(graph.find_server(key(server)), graph.find_user(key(user)))
+    profiles = {user: ([], []) for user in users}
+    for user, friend in sorted(mutual_friends):
+        profiles[user][0].append(graph.find_user(key(friend)))
+    for user, server in sorted(mutual_servers):
+        profiles[user][1].append(graph.find_server(key(server)))
+    for user, (friends, servers) in profiles.items():
+        graph.set_profile(graph.find_user(key(user)), False, friends, servers)
+    return graph
+
+
+@pytest.mark.parametrize(
+    "key",
+    # Snowflake IDs, and the name keys of old JSON files that cannot be read as integers
+    [int, lambda key: f"name{key}"],
+    ids=["int_keys", "string_keys"],
+)
+def test_diff_finds_the_changed_memberships_friends_and_users(key):
+    base = synthetic_graph(MEMBERS, seed=1)
+    membership, mutual_friends, mutual_servers = edge_ids(base)
+    crawled = [base.server_keys[server] for server in base.crawled_servers]
+    first_server, second_server, third_server = crawled[:3]
+
+    # The user who leaves a crawled server
+    leaving = min(user for server, user in membership if server == second_server)
+    # The user who gains a mutual friend, and that friend
+    befriending, friend = USER_ID_BASE + 1, USER_ID_BASE + 2
+    # The user who joins a crawled server they already shared with the account
+    joining = min(user for user in base.user_keys if (third_server, user) not in membership)
+    assert (befriending, friend) not in mutual_friends
+    assert leaving != befriending
+
+    old_edges = (
+        membership | {(first_server, REMOVED_USER)},
+        mutual_friends,
+        mutual_servers | {(REMOVED_USER, first_server)},
+    )
+    new_edges = (
+        membership - {(second_server, leaving)} | {(first_server, ADDED_USER), (third_server, joining)},
+        mutual_friends | {(ADDED_USER, friend), (befriending, friend)},
+        mutual_servers - {(leaving, second_server)} | {(ADDED_USER, first_server)},
+    )
+    servers = list(base.server_keys)
+    old = build_graph(base.user_keys + [REMOVED_USER], servers, crawled, old_edges, key)
+    # Interned in reverse, so no node ID means the same user or server in both graphs
+    new = build_graph([ADDED_USER] + base.user_keys[::-1], servers[::-1], crawled, new_edges, key)
+
+    diff = diff_graphs(old, new)
+
+    def ids(*keys) -> list:
+        return [str(key(id_)) for id_ in keys]
+
+    assert diff["users"] == {"added": ids(ADDED_USER), "removed": ids(REMOVED_USER)}
+    assert diff["servers"] == {"added": [], "removed": []}
+    assert diff["crawled_servers"] == {"added": [], "removed": []}
+    # Edges come back as [source, target] IDs, which only round-trips through
+    # the source * target_count + target encoding if both halves are decoded right
+    assert sorted(diff["membership"]["added"]) == sorted([ids(first_server, ADDED_USER), ids(third_server, joining)])
+    assert sorted(diff["membership"]["removed"]) == sorted(
+        [ids(first_server, REMOVED_USER), ids(second_server, leaving)]
+    )
+    assert sorted(diff["mutual_friends"]["added"]) == sorted([ids(ADDED_USER, friend), ids(befriending, friend)])
+    assert diff["mutual_friends"]["removed"] == []
+    assert diff["mutual_servers"]["added"] == [ids(ADDED_USER, first_server)]
+    assert sorted(diff["mutual_servers"]["removed"]) == sorted(
+        [ids(REMOVED_USER, first_server), ids(leaving, second_server)]
+    )
+    # The user who only joined a server changed through the user column of a
+    # membership edge; removed users have no profile left to fetch
+    assert changed_users(diff) == set(ids(ADDED_USER, leaving, befriending, joining))
+
+
+def test_diff_of_a_reordered_copy_is_empty():
+    graph = synthetic_graph(MEMBERS, seed=1)
+    crawled = [graph.server_keys[server] for server in graph.crawled_servers]
+    copy = build_graph(graph.user_keys[::-1], graph.server_keys[::-1], crawled, edge_ids(graph), int)
+
+    diff = diff_graphs(graph, copy)
+
+    assert all(changes == {"added": [], "removed": []} for changes in diff.values())
+    assert changed_users(diff) == set()
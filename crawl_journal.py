@@ -0,0 +1,48 @@
+import logging
+import os
+
+from graph_core import MutualGraph
+from output_writer import RecordStream, read_records
+
+
+class CrawlJournal(RecordStream):
+    """Durable crawl record stream, used to resume an interrupted crawl.
+
+    Every started server, every completed member and every finished server is
+    written as one line and fsynced immediately, so a crash or Ctrl+C loses at
+    most the member being fetched.
+    """
+
+    def __init__(self, path: str, resume: bool = False):
+        self.resume = resume and os.path.exists(path)
+        if resume and not self.resume:
+            logging.warning(f"No crawl journal found at {path}, starting a new crawl.")
+        self.started_servers = set()
+        self.completed_servers = set()
+        self.server_progress = dict()
+        super().__init__(path, append=self.resume, durable=True)
+
+    def replay(self, graph: MutualGraph) -> None:
+        """Rebuild the graph and per-server progress from a previous run's journal."""
+        if not self.resume:
+            return
+        for record in read_records(self.path):
+            graph.apply_record(record)
+            self._track(record)
+        logging.info(
+            f"Resumed {graph.user_count} users and {len(self.completed_servers)}/{len(self.started_servers)} completed servers from {self.path}"
+        )
+
+    def _track(self, record: dict) -> None:
+        record_type = record["type"]
+        if record_type == "server":
+            self.started_servers.add(record["id"])
+            self.server_progress.setdefault(record["id"], set())
+        elif record_type == "member":
+            self.server_progress[record["server"]].add(record["id"])
+        elif record_type == "server_done":
+            self.completed_servers.add(record["id"])
+
+    def _write(self, record: dict) -> None:
+        self._track(record)
+        super()._write(record)
@@ -0,0 +1,162 @@
+import asyncio
+import bisect
+import json
+import logging
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from aiohttp import web
+
+# Upper bounds, in seconds, of the profile fetch latency histogram buckets
+PROFILE_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRIC_PREFIX = "discord_crawl"
+
+
+class CrawlMetrics:
+    """Counters, phase timers and the profile fetch latency histogram of one crawl.
+
+    Recording is a dict update, cheap enough for the per-member loop. The
+    totals are read back as a JSON-ready ``snapshot`` or as Prometheus text.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        # Events: cache hits and misses, profiles fetched, 429s, ...
+        self.counts = Counter()
+        # Seconds spent per phase: enumeration, rate_limit, pause, backoff, post-processing stages
+        self.seconds = Counter()
+        self.guilds = []
+        self.profile_latency = [0] * (len(PROFILE_LATENCY_BUCKETS) + 1)
+        self.profile_latency_sum = 0.0
+        self.progress = {}
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.counts[name] += amount
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+
+    async def sleep(self, name: str, seconds: float) -> None:
+        """``asyncio.sleep`` that books the time under ``name``."""
+        with self.timer(name):
+            await asyncio.sleep(seconds)
+
+    def observe_profile(self, seconds: float) -> None:
+        self.profile_latency[bisect.bisect_left(PROFILE_LATENCY_BUCKETS, seconds)] += 1
+        self.profile_latency_sum += seconds
+
+    def observe_guild(self, server_id, name: str, seconds: float, members: int) -> None:
+        self.guilds.append({"id": str(server_id), "name": name, "enumeration_seconds": seconds, "members": members})
+        self.seconds["enumeration"] += seconds
+
+    def set_progress(self, state: dict) -> None:
+        self.progress = state
+
+    def snapshot(self) -> dict:
+        return {
+            "uptime_seconds": time.time() - self.started,
+            "counts": dict(self.counts),
+            "seconds": dict(self.seconds),
+            "profile_latency": {
+                "buckets": dict(zip([*map(str, PROFILE_LATENCY_BUCKETS), "+Inf"], self.profile_latency)),
+                "count": sum(self.profile_latency),
+                "sum": self.profile_latency_sum,
+            },
+            "guilds": self.guilds,
+            "progress": self.progress,
+        }
+
+    def prometheus(self) -> str:
+        """The metrics in the Prometheus text exposition format."""
+        lines = [
+            f"# TYPE {METRIC_PREFIX}_uptime_seconds gauge",
+            f"{METRIC_PREFIX}_uptime_seconds {time.time() - self.started}",
+            f"# TYPE {METRIC_PREFIX}_events_total counter",
+        ]
+        lines += [f'{METRIC_PREFIX}_events_total{{event="{name}"}} {value}' for name, value in sorted(self.counts.items())]
+        lines.append(f"# TYPE {METRIC_PREFIX}_phase_seconds_total counter")
+        lines += [
+            f'{METRIC_PREFIX}_phase_seconds_total{{phase="{name}"}} {value}' for name, value in sorted(self.seconds.items())
+        ]
+        name = f"{METRIC_PREFIX}_profile_fetch_seconds"
+        lines.append(f"# TYPE {name} histogram")
+        cumulative = 0
+        for bound, count in zip([*map(str, PROFILE_LATENCY_BUCKETS), "+Inf"], self.profile_latency):
+            cumulative += count
+            lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+        lines += [f"{name}_sum {self.profile_latency_sum}", f"{name}_count {cumulative}"]
+        if self.progress:
+            lines += [
+                f"# TYPE {METRIC_PREFIX}_members_done gauge",
+                f"{METRIC_PREFIX}_members_done {self.progress['members_done']}",
+                f"# TYPE {METRIC_PREFIX}_members_per_second gauge",
+                f"{METRIC_PREFIX}_members_per_second {self.progress['members_per_second']}",
+            ]
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path: str) -> None:
+        # Written to a temporary file and renamed, so readers never see a partial file
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "w") as f:
+            json.dump(self.snapshot(), f, indent=4)
+        os.replace(temporary_path, path)
+
+
+class MetricsExporter:
+    """Publishes ``CrawlMetrics`` while the crawl runs.
+
+    Serves Prometheus text at ``/metrics`` (and the JSON snapshot at
+    ``/stats``) on ``port``, and rewrites ``stats_file`` every ``interval``
+    seconds; either may be None.
+    """
+
+    def __init__(self, metrics: CrawlMetrics, port: int = None, stats_file: str = None, interval: float = 10.0):
+        self.metrics = metrics
+        self.port = port
+        self.stats_file = stats_file
+        self.interval = interval
+        self._runner = None
+        self._task = None
+
+    async def _metrics(self, request):
+        return web.Response(text=self.metrics.prometheus(), content_type="text/plain", charset="utf-8")
+
+    async def _stats(self, request):
+        return web.json_response(self.metrics.snapshot())
+
+    async def _write_periodically(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.write()
+
+    def write(self) -> None:
+        try:
+            self.metrics.write_json(self.stats_file)
+        except OSError as e:
+            logging.warning(f"Could not write crawl stats to {self.stats_file}: {e}")
+
+    async def start(self) -> None:
+        if self.port is not None:
+            app = web.Application()
+            app.add_routes([web.get("/metrics", self._metrics), web.get("/stats", self._stats)])
+            self._runner = web.AppRunner(app)
+            await self._runner.setup()
+            await web.TCPSite(self._runner, "127.0.0.1", self.port).start()
+            logging.info(f"Serving crawl metrics at http://localhost:{self.port}/metrics")
+        if self.stats_file:
+            self._task = asyncio.create_task(self._write_periodically())
+
+    async def stop(self) -> None:
+        """Stop publishing; the stats file gets one final write with the finished crawl's totals."""
+        if self._task:
+            self._task.cancel()
+            self.write()
+        if self._runner:
+            await self._runner.cleanup()
@@ -1,4 +1,6 @@
-from dash import html
+import math
+
+from dash import dcc, html
 import dash_cytoscape as cyto
 
 def calculate_text_width(text: str, font_size: int = 14) -> int:
@@ -110,6 +112,29 @@ def create_stylesheet():
             },
         },
 
+        # Collapsed members of a server (level-of-detail view)
+        {
+            "selector": "[group = 'cluster']",
+            "style": {
+                "background-color": "#374151",
+                "border-color": "#5865F2",
+                "font-size": "11px",
+                "color": "#ffffff",
+                "text-outline-width": "0px",
+                "shape": "ellipse",
+            },
+        },
+
+        {
+            "selector": "[edge_type = 'cluster']",
+            "style": {
+                "line-color": "#5865F2",
+                "target-arrow-color": "#5865F2",
+                "width": "data(weight_width)",
+                "opacity": "0.6",
+            },
+        },
+
         # Hover effects
         {
             "selector": "node:active",
@@ -143,6 +168,15 @@ def create_stylesheet():
             },
         },
 
+        {
+            "selector": ".connected-node",
+            "style": {
+                "border-color": "#fbbf24",
+                "border-width": "4px",
+                "z-index": "8",
+            },
+        },
+
         # Dimmed elements during highlighting
         {
             "selector": ".dimmed",
@@ -152,7 +186,37 @@ def create_stylesheet():
         },
     ]
 
-def build_dash_layout(elements, stylesheet):
+def create_selection_stylesheet():
+    """Base stylesheet while a node is selected: every node not carrying a highlight class is dimmed.
+
+    The rule count is fixed, so a click only changes the classes of the
+    highlighted elements instead of adding a selector per node.
+    """
+    return create_stylesheet() + [
+        {
+            "selector": "node",
+            "style": {
+                "opacity": "0.3",
+            },
+        },
+        {
+            "selector": ".highlighted-node, .connected-node",
+            "style": {
+                "opacity": "1",
+            },
+        },
+    ]
+
+PAGER_BUTTON_STYLE = {
+    "padding": "0.25rem 0.75rem",
+    "backgroundColor": "#374151",
+    "color": "#f9fafb",
+    "border": "none",
+    "borderRadius": "0.375rem",
+    "cursor": "pointer",
+}
+
+def build_dash_layout(elements, stylesheet, graph_data):
     return html.Div([
         html.Div([
             html.Div([
@@ -182,7 +246,13 @@ def build_dash_layout(elements, stylesheet):
                     autoungrabify=False,
                     userZoomingEnabled=True,
                     userPanningEnabled=True,
-                )
+                ),
+                # Indices of the elements currently carrying highlight classes
+                dcc.Store(id="highlighted-elements", data=[]),
+                # Labels and adjacency read by the clientside selection callback
+                dcc.Store(id="graph-data", data=graph_data),
+                # Id of the server whose members are drawn, in level-of-detail mode
+                dcc.Store(id="expanded-server", data=None),
             ], style={
                 "flex": "1",
                 "height": "100vh",
@@ -202,24 +272,53 @@ def build_dash_layout(elements, stylesheet):
                         "cursor": "pointer",
                     }),
                 ], style={"padding": "0 1.5rem 0 1.5rem"}),
-                html.Div(id="node-info", children=[
-                    html.H3("Guide", style={
-                        "margin": "0 0 1rem 0",
-                        "color": "#f9fafb",
-                        "fontSize": "1.125rem",
-                        "fontWeight": "600",
-                    }),
-                    html.Div([
-                        html.P("Click any node to see connections",
-                              style={"margin": "0 0 0.75rem 0", "color": "#9ca3af", "fontSize": "0.875rem"}),
-                        html.P("Blue = Users",
-                              style={"margin": "0 0 0.5rem 0", "color": "#3b82f6", "fontSize": "0.875rem", "fontWeight": "500"}),
-                        html.P("Green = Servers",
-                              style={"margin": "0 0 0.5rem 0", "color": "#10b981", "fontSize": "0.875rem", "fontWeight": "500"}),
-                        html.P("Red = You",
-                              style={"margin": "0 0 1rem 0", "color": "#ef4444", "fontSize": "0.875rem", "fontWeight": "500"}),
+                html.Div([
+                    html.Div(id="node-info", children=[
+                        html.H3("Guide", style={
+                            "margin": "0 0 1rem 0",
+                            "color": "#f9fafb",
+                            "fontSize": "1.125rem",
+                            "fontWeight": "600",
+                        }),
+                        html.Div([
+                            html.P("Click any node to see connections",
+                                  style={"margin": "0 0 0.75rem 0", "color": "#9ca3af", "fontSize": "0.875rem"}),
+                            html.P("Blue = Users",
+                                  style={"margin": "0 0 0.5rem 0", "color": "#3b82f6", "fontSize": "0.875rem", "fontWeight": "500"}),
+                            html.P("Green = Servers",
+                                  style={"margin": "0 0 0.5rem 0", "color": "#10b981", "fontSize": "0.875rem", "fontWeight": "500"}),
+                            html.P("Red = You",
+                                  style={"margin": "0 0 1rem 0", "color": "#ef4444", "fontSize": "0.875rem", "fontWeight": "500"}),
+                        ]),
+                        html.Hr(style={"border": "none", "borderTop": "1px solid #374151", "margin": "1rem 0"}),
                     ]),
-                    html.Hr(style={"border": "none", "borderTop": "1px solid #374151", "margin": "1rem 0"}),
+                    # Most similar servers or users for the selected node, filled in by a callback
+                    html.Div(id="node-analytics"),
+                    # One page of the selected node's servers or members, filled in by a callback
+                    html.Div(id="list-controls", children=[
+                        dcc.Input(id="list-search", type="search", placeholder="Search", debounce=True, style={
+                            "width": "100%",
+                            "padding": "0.375rem 0.5rem",
+                            "margin": "0 0 0.5rem 0",
+                            "backgroundColor": "#1f2937",
+                            "color": "#f9fafb",
+                            "border": "1px solid #374151",
+                            "borderRadius": "0.375rem",
+                            "boxSizing": "border-box",
+                        }),
+                        html.Div([
+                            html.Button("Prev", id="list-prev", n_clicks=0, style=PAGER_BUTTON_STYLE),
+                            html.Span(id="list-page-label", style={"color": "#9ca3af", "fontSize": "0.75rem"}),
+                            html.Button("Next", id="list-next", n_clicks=0, style=PAGER_BUTTON_STYLE),
+                        ], style={
+                            "display": "flex",
+                            "justifyContent": "space-between",
+                            "alignItems": "center",
+                            "margin": "0 0 0.75rem 0",
+                        }),
+                    ], style={"display": "none"}),
+                    html.Div(id="node-list"),
+                    dcc.Store(id="list-state", data={"kind": None, "id": None, "page": 0}),
                 ], style={
                     "padding": "1.5rem",
                     "height": "100vh",
@@ -245,48 +344,105 @@ def build_dash_layout(elements, stylesheet):
         "overflow": "hidden",
     })
 
-def create_graph_elements(users_to_servers):
+def membership_edge_id(user, server):
+    return f"{user}-{server}"
+
+def connection_edge_id(server):
+    return f"{server}-Me"
+
+def cluster_node_id(server):
+    return f"{server}-members"
+
+def create_cluster_elements(bundle, hidden_counts):
+    """One collapsed node per server standing in for its members that are not drawn.
+
+    Each cluster links to its server with an edge weighted by the number of
+    members it stands for.
+    """
+    nodes = []
+    edges = []
+    for row in bundle.server_rows:
+        server = bundle.ids[row]
+        count = int(hidden_counts[row - bundle.user_count])
+        if count == 0:
+            continue
+        label = f"{count} members"
+        width, height = calculate_node_dimensions(label, "user")
+        nodes.append({
+            "data": {
+                "id": cluster_node_id(server),
+                "label": label,
+                "group": "cluster",
+                "server": server,
+                "width": width,
+                "height": height,
+                "user_count": count
+            },
+            "position": {"x": float(bundle.x[row]) - 150, "y": float(bundle.y[row])},
+        })
+        edges.append({
+            "data": {
+                "id": membership_edge_id(cluster_node_id(server), server),
+                "source": cluster_node_id(server),
+                "target": server,
+                "edge_type": "cluster",
+                "weight": count,
+                "weight_width": min(2 + math.log2(count), 14)
+            }
+        })
+    return nodes + edges
+
+def create_graph_elements(bundle):
+    """Cytoscape elements: a node per bundle row, the "Me" node, membership edges in CSR order, then connection edges.
+
+    assets/graph_callbacks.js addresses elements by these positions.
+    """
     elements = []
-    users = list(users_to_servers.keys())
-    servers = sorted({srv for lst in users_to_servers.values() for srv in lst})
-    # Calculate layout positions
-    max_nodes_column = max(len(users), len(servers))
-    vertical_spacing = max(70, 800 / max_nodes_column) if max_nodes_column > 0 else 100
-
-    # Add user nodes (left column)
-    user_start_y = (1200 - (len(users) - 1) * vertical_spacing) / 2
-    for i, user in enumerate(users):
-        width, height = calculate_node_dimensions(user, "user")
+    user_rows = bundle.user_rows
+    server_rows = bundle.server_rows
+    server_user_counts = bundle.server_user_counts()
+
+    # Add user nodes
+    for row in user_rows:
+        user = bundle.ids[row]
+        label = bundle.labels[row]
+        width, height = calculate_node_dimensions(label, "user")
         elements.append({
             "data": {
                 "id": user,
-                "label": user,
+                "label": label,
                 "group": "user",
                 "width": width,
                 "height": height,
-                "connections": len(users_to_servers[user])
+                "connections": bundle.degree(row)
             },
-            "position": {"x": -500, "y": user_start_y + i * vertical_spacing},
+            "position": {"x": float(bundle.x[row]), "y": float(bundle.y[row])},
         })
 
-    # Add server nodes (middle column)
-    server_start_y = (1200 - (len(servers) - 1) * vertical_spacing) / 2
-    for i, server in enumerate(servers):
-        width, height = calculate_node_dimensions(server, "server")
-        user_count = sum(1 for user_servers in users_to_servers.values() if server in user_servers)
+    # Add server nodes
+    for row in server_rows:
+        server = bundle.ids[row]
+        label = bundle.labels[row]
+        width, height = calculate_node_dimensions(label, "server")
         elements.append({
             "data": {
                 "id": server,
-                "label": server,
+                "label": label,
                 "group": "server",
                 "width": width,
                 "height": height,
-                "user_count": user_count
+                "user_count": int(server_user_counts[row - bundle.user_count])
             },
-            "position": {"x": 600, "y": server_start_y + i * vertical_spacing},
+            "position": {"x": float(bundle.x[row]), "y": float(bundle.y[row])},
         })
 
+    # You sit to the right of the servers
     me_width, me_height = calculate_node_dimensions("You", "me")
+    me_x, me_y = 1100, 500
+    if len(server_rows):
+        server_x = bundle.x[server_rows.start:server_rows.stop]
+        me_x = float(server_x.max()) + 600
+        me_y = float(bundle.y[server_rows.start:server_rows.stop].mean())
     elements.append({
         "data": {
             "id": "Me",
@@ -294,17 +450,19 @@ def create_graph_elements(users_to_servers):
             "group": "me",
             "width": me_width,
             "height": me_height,
-            "total_servers": len(servers)
+            "total_servers": len(server_rows)
         },
-        "position": {"x": 1100, "y": 500},
+        "position": {"x": me_x, "y": me_y},
     })
 
     # Add edges: user -> server
-    for user, server_list in users_to_servers.items():
-        for server in server_list:
+    for row in user_rows:
+        user = bundle.ids[row]
+        for server_row in bundle.neighbors(row):
+            server = bundle.ids[server_row]
             elements.append({
                 "data": {
-                    "id": f"{user}-{server}",
+                    "id": membership_edge_id(user, server),
                     "source": user,
                     "target": server,
                     "edge_type": "membership"
@@ -312,10 +470,11 @@ def create_graph_elements(users_to_servers):
             })
 
     # Add edges: server -> Me
-    for server in servers:
+    for row in server_rows:
+        server = bundle.ids[row]
         elements.append({
             "data": {
-                "id": f"{server}-Me",
+                "id": connection_edge_id(server),
                 "source": server,
                 "target": "Me",
                 "edge_type": "connection"
@@ -0,0 +1,221 @@
+import json
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.ipc
+
+from graph_layout import cached_layout
+
+BUNDLE_FILE = "dashboard.arrow"
+
+
+class DashboardBundle:
+    """Precomputed dashboard data: node table, user -> server adjacency, positions and stats.
+
+    Users occupy rows ``[0, user_count)`` and servers the rows after them.
+    Adjacency is CSR over those rows (``indptr``/``indices``), together with
+    the inverted server -> members index, so the whole bundle is a handful of
+    flat arrays that are written to, and memory-mapped back from, a single
+    Arrow IPC file.
+    """
+
+    def __init__(self, ids, labels, user_count, x, y, indptr, indices, stats, sources=(), members=None):
+        self.ids = ids
+        self.labels = labels
+        self.user_count = user_count
+        self.x = x
+        self.y = y
+        self.indptr = indptr
+        self.indices = indices
+        self.stats = stats
+        # Names of the crawl output files this bundle was built from
+        self.sources = list(sources)
+        self._rows = None
+        self._members = members
+
+    @property
+    def user_rows(self) -> range:
+        return range(self.user_count)
+
+    @property
+    def server_rows(self) -> range:
+        return range(self.user_count, len(self.ids))
+
+    def is_user(self, row: int) -> bool:
+        return row < self.user_count
+
+    def node_row(self, node_id: str):
+        if self._rows is None:
+            self._rows = dict(zip(self.ids, range(len(self.ids))))
+        return self._rows.get(node_id)
+
+    def neighbors(self, row: int) -> np.ndarray:
+        return self.indices[self.indptr[row]:self.indptr[row + 1]]
+
+    def degree(self, row: int) -> int:
+        return int(self.indptr[row + 1] - self.indptr[row])
+
+    def server_member_index(self):
+        """Inverted (server -> users) CSR: ``(indptr, user rows, membership edge positions)``.
+
+        Built once, by a stable sort of the user -> server edges, when the
+        bundle is built and stored with it; member counts, the servers panel
+        and server details all read from it.
+        """
+        if self._members is None:
+            user_count = self.user_count
+            servers = self.indices[:self.indptr[user_count]].astype(np.int64) - user_count
+            users = np.repeat(np.arange(user_count, dtype=np.uint32), np.diff(self.indptr[:user_count + 1]))
+            members_indptr = np.zeros(len(self.ids) - user_count + 1, dtype=np.int64)
+            np.cumsum(np.bincount(servers, minlength=len(members_indptr) - 1), out=members_indptr[1:])
+            # Position of each membership edge in the user -> server CSR, in server order
+            member_edges = np.argsort(servers, kind="stable")
+            self._members = (members_indptr, users[member_edges], member_edges)
+        return self._members
+
+    def server_members(self, row: int) -> np.ndarray:
+        members_indptr, members, _ = self.server_member_index()
+        server = row - self.user_count
+        return members[members_indptr[server]:members_indptr[server + 1]]
+
+    def server_user_counts(self) -> np.ndarray:
+        return np.diff(self.server_member_index()[0])
+
+    def subgraph(self, user_rows) -> "DashboardBundle":
+        """A bundle of the given users and every server, e.g. for a level-of-detail view.
+
+        Positions and stats stay those of the whole graph.
+        """
+        user_rows = np.asarray(user_rows, dtype=np.int64)
+        server_count = len(self.ids) - self.user_count
+        starts = self.indptr[user_rows]
+        degrees = self.indptr[user_rows + 1] - starts
+        indptr = np.zeros(len(user_rows) + server_count + 1, dtype=np.int64)
+        np.cumsum(degrees, out=indptr[1:len(user_rows) + 1])
+        indptr[len(user_rows) + 1:] = indptr[len(user_rows)]
+        # Gather each user's slice of indices, then shift server rows down past the dropped users
+        positions = np.repeat(starts - indptr[:len(user_rows)], degrees) + np.arange(indptr[-1])
+        indices = (self.indices[positions].astype(np.int64) - self.user_count + len(user_rows)).astype(np.uint32)
+        rows = np.concatenate([user_rows, np.arange(self.user_count, len(self.ids))])
+        bundle = DashboardBundle(
+            [self.ids[row] for row in rows],
+            [self.labels[row] for row in rows],
+            len(user_rows),
+            self.x[rows],
+            self.y[rows],
+            indptr,
+            indices,
+            self.stats,
+            self.sources,
+        )
+        bundle.server_member_index()
+        return bundle
+
+    @classmethod
+    def from_users_to_servers(cls, users_to_servers: dict, labels: dict = None, layout_dir: str = None) -> "DashboardBundle":
+        """Build a bundle, laying the graph out or reusing the positions cached in ``layout_dir``."""
+        labels = labels or {}
+        users = list(users_to_servers)
+        servers = sorted({srv for lst in users_to_servers.values() for srv in lst},
+                         key=lambda srv: labels.get(srv, srv))
+        server_rows = {server: len(users) + i for i, server in enumerate(servers)}
+
+        indptr = np.zeros(len(users) + len(servers) + 1, dtype=np.int64)
+        indptr[1:len(users) + 1] = np.cumsum([len(users_to_servers[user]) for user in users])
+        indptr[len(users) + 1:] = indptr[len(users)]
+        indices = np.fromiter(
+            (server_rows[server] for user in users for server in users_to_servers[user]),
+            dtype=np.uint32,
+            count=int(indptr[-1]),
+        )
+        ids = users + servers
+        x, y = cached_layout(ids, len(users), indptr, indices, layout_dir)
+        stats = {
+            "users": len(users),
+            "servers": len(servers),
+            "connections": int(indptr[-1]),
+        }
+        bundle = cls(
+            ids,
+            [labels.get(node_id, node_id) for node_id in ids],
+            len(users),
+            x,
+            y,
+            indptr,
+            indices,
+            stats,
+        )
+        bundle.server_member_index()
+        return bundle
+
+    def write(self, path: str) -> str:
+        neighbors = pa.LargeListArray.from_arrays(
+            pa.array(self.indptr, type=pa.int64()), pa.array(self.indices, type=pa.uint32())
+        )
+        # Inverted index as list columns over the same rows; user rows hold empty lists
+        members_indptr, members, member_edges = self.server_member_index()
+        members_offsets = pa.array(
+            np.concatenate([np.zeros(self.user_count, dtype=np.int64), members_indptr]), type=pa.int64()
+        )
+        table = pa.table({
+            "id": pa.array(self.ids, type=pa.string()),
+            "label": pa.array(self.labels, type=pa.string()),
+            "x": pa.array(self.x, type=pa.float64()),
+            "y": pa.array(self.y, type=pa.float64()),
+            "neighbors": neighbors,
+            "members": pa.LargeListArray.from_arrays(members_offsets, pa.array(members, type=pa.uint32())),
+            "member_edges": pa.LargeListArray.from_arrays(
+                members_offsets, pa.array(member_edges, type=pa.int64())
+            ),
+        })
+        table = table.replace_schema_metadata({
+            "user_count": str(self.user_count),
+            "stats": json.dumps(self.stats),
+            "sources": json.dumps(self.sources),
+        })
+        with pa.OSFile(path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        return path
+
+    @classmethod
+    def read(cls, path: str) -> "DashboardBundle":
+        table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all().combine_chunks()
+        metadata = table.schema.metadata
+        neighbors = _list_column(table, "neighbors", pa.uint32())
+        user_count = int(metadata[b"user_count"])
+        members = None
+        if "members" in table.column_names:
+            member_users = _list_column(table, "members", pa.uint32())
+            members = (
+                member_users.offsets.to_numpy()[user_count:],
+                member_users.values.to_numpy(),
+                _list_column(table, "member_edges", pa.int64()).values.to_numpy(),
+            )
+        return cls(
+            table.column("id").to_pylist(),
+            table.column("label").to_pylist(),
+            user_count,
+            table.column("x").to_numpy(),
+            table.column("y").to_numpy(),
+            neighbors.offsets.to_numpy(),
+            neighbors.values.to_numpy(),
+            json.loads(metadata[b"stats"]),
+            json.loads(metadata.get(b"sources", b"[]")),
+            members,
+        )
+
+
+def _list_column(table: pa.Table, name: str, value_type) -> pa.LargeListArray:
+    chunks = table.column(name).chunks
+    return chunks[0] if chunks else pa.array([], pa.large_list(value_type))
+
+
+def bundle_path_for(path: str) -> str:
+    """The dashboard bundle that sits next to a crawl output file or snapshot directory."""
+    return os.path.join(os.path.dirname(os.path.normpath(path)), BUNDLE_FILE)
+
+
+def source_name(path: str) -> str:
+    return os.path.basename(os.path.normpath(path))
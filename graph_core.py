@@ -0,0 +1,309 @@
+import glob
+import json
+import os
+from array import array
+
+from output_writer import open_input, read_records
+
+
+class CSRAdjacency:
+    """Compressed sparse row adjacency: row -> contiguous slice of column ids."""
+
+    __slots__ = ("indptr", "indices")
+
+    def __init__(self, rows: int, sources: array, targets: array):
+        # Counting sort of the (source, target) pairs; stable, so each row keeps
+        # its targets in insertion order.
+        indptr = array("q", [0]) * (rows + 1)
+        for source in sources:
+            indptr[source + 1] += 1
+        for row in range(rows):
+            indptr[row + 1] += indptr[row]
+        indices = array("I", [0]) * len(targets)
+        cursor = indptr[:-1]
+        for source, target in zip(sources, targets):
+            indices[cursor[source]] = target
+            cursor[source] += 1
+        self.indptr = indptr
+        self.indices = indices
+
+    @classmethod
+    def from_buffers(cls, indptr, indices) -> "CSRAdjacency":
+        """Wrap prebuilt CSR offsets (int64) and indices (uint32) buffers."""
+        adjacency = cls.__new__(cls)
+        adjacency.indptr = _array("q", indptr)
+        adjacency.indices = _array("I", indices)
+        return adjacency
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    def __getitem__(self, row: int) -> array:
+        return self.indices[self.indptr[row]:self.indptr[row + 1]]
+
+    def degree(self, row: int) -> int:
+        return self.indptr[row + 1] - self.indptr[row]
+
+
+class MutualGraph:
+    """Crawl results as interned integer node tables plus CSR edge arrays.
+
+    Users and servers are keyed by their Discord snowflake IDs and interned once
+    into dense integer node IDs; display names live in a separate attribute
+    table (``user_names``/``server_names``). Membership (server -> users),
+    mutual friend (user -> users) and mutual server (user -> servers) edges are
+    appended as flat integer arrays while crawling and compressed into CSR form
+    on first read, so a member's profile is stored once no matter how many
+    servers they show up in.
+    """
+
+    def __init__(self):
+        self.user_keys = []
+        self.user_names = []
+        self.server_keys = []
+        self.server_names = []
+        self.is_friend = bytearray()
+        self.profiled = bytearray()
+        self.crawled_servers = array("I")
+        self._user_index = {}
+        self._server_index = {}
+        self._member_edges = (array("I"), array("I"))
+        self._friend_edges = (array("I"), array("I"))
+        self._mutual_server_edges = (array("I"), array("I"))
+        self._csr = None
+
+    @property
+    def user_count(self) -> int:
+        return len(self.user_keys)
+
+    @property
+    def server_count(self) -> int:
+        return len(self.server_keys)
+
+    def intern_user(self, key, name=None) -> int:
+        node = self._user_index.get(key)
+        if node is None:
+            node = len(self.user_keys)
+            self._user_index[key] = node
+            self.user_keys.append(key)
+            self.user_names.append(str(key) if name is None else name)
+            self.is_friend.append(0)
+            self.profiled.append(0)
+            self._csr = None
+        elif name is not None:
+            self.user_names[node] = name
+        return node
+
+    def intern_server(self, key, name=None) -> int:
+        node = self._server_index.get(key)
+        if node is None:
+            node = len(self.server_keys)
+            self._server_index[key] = node
+            self.server_keys.append(key)
+            self.server_names.append(str(key) if name is None else name)
+            self._csr = None
+        elif name is not None:
+            self.server_names[node] = name
+        return node
+
+    def user_id(self, user: int) -> str:
+        return str(self.user_keys[user])
+
+    def server_id(self, server: int) -> str:
+        return str(self.server_keys[server])
+
+    def find_user(self, key):
+        return self._user_index.get(key)
+
+    def find_server(self, key):
+        return self._server_index.get(key)
+
+    def add_crawled_server(self, key, name=None) -> int:
+        node = self.intern_server(key, name)
+        self.crawled_servers.append(node)
+        return node
+
+    def add_member(self, server: int, user: int) -> None:
+        self._member_edges[0].append(server)
+        self._member_edges[1].append(user)
+        self._csr = None
+
+    def set_profile(self, user: int, is_friend: bool, mutual_friends, mutual_servers) -> None:
+        self.is_friend[user] = 1 if is_friend else 0
+        self.profiled[user] = 1
+        for friend in mutual_friends:
+            self._friend_edges[0].append(user)
+            self._friend_edges[1].append(friend)
+        for server in mutual_servers:
+            self._mutual_server_edges[0].append(user)
+            self._mutual_server_edges[1].append(server)
+        self._csr = None
+
+    def _freeze(self):
+        if self._csr is None:
+            self._csr = (
+                CSRAdjacency(self.server_count, *self._member_edges),
+                CSRAdjacency(self.user_count, *self._friend_edges),
+                CSRAdjacency(self.user_count, *self._mutual_server_edges),
+            )
+        return self._csr
+
+    @property
+    def members(self) -> CSRAdjacency:
+        return self._freeze()[0]
+
+    @property
+    def mutual_friends(self) -> CSRAdjacency:
+        return self._freeze()[1]
+
+    @property
+    def mutual_servers(self) -> CSRAdjacency:
+        return self._freeze()[2]
+
+    def to_server_info(self) -> dict:
+        """Expand the graph into the nested ``server_info`` JSON structure, keyed by ID."""
+        members, mutual_friends, mutual_servers = self._freeze()
+        server_info = dict()
+        for server in self.crawled_servers:
+            records = dict()
+            for user in members[server]:
+                records[self.user_id(user)] = {
+                    "is_friend": bool(self.is_friend[user]),
+                    "mutual_friends": [self.user_id(friend) for friend in mutual_friends[user]],
+                    "mutual_servers": [
+                        self.server_id(mutual_server)
+                        for mutual_server in mutual_servers[user]
+                        if mutual_server != server
+                    ],
+                }
+            server_info[self.server_id(server)] = records
+        return server_info
+
+    def to_names(self) -> dict:
+        """ID -> display name attribute tables for users and servers."""
+        return {
+            "users": {self.user_id(user): name for user, name in enumerate(self.user_names)},
+            "servers": {self.server_id(server): name for server, name in enumerate(self.server_names)},
+        }
+
+    @classmethod
+    def from_server_info(cls, server_info: dict, names: dict = None) -> "MutualGraph":
+        """Build a graph from a previously written ``server_info`` JSON structure.
+
+        Files written before members were keyed by ID use names as keys; those
+        keys are kept as-is and double as display names.
+        """
+        names = names or dict()
+        user_names = names.get("users", dict())
+        server_names = names.get("servers", dict())
+
+        def intern_user(key):
+            return graph.intern_user(_parse_key(key), user_names.get(key, key))
+
+        def intern_server(key):
+            return graph.intern_server(_parse_key(key), server_names.get(key, key))
+
+        graph = cls()
+        profiles = dict()
+        for server_key, members in server_info.items():
+            server = graph.add_crawled_server(_parse_key(server_key), server_names.get(server_key, server_key))
+            for member_key, info in members.items():
+                user = intern_user(member_key)
+                graph.add_member(server, user)
+                if user not in profiles:
+                    profiles[user] = (
+                        info.get("is_friend", False),
+                        [intern_user(friend) for friend in info.get("mutual_friends", [])],
+                        dict(),
+                    )
+                # Each record omits the server it is filed under, so the full
+                # mutual server set is the union over all of the member's records.
+                mutual_servers = profiles[user][2]
+                mutual_servers[server] = None
+                for mutual_server_key in info.get("mutual_servers", []):
+                    mutual_servers[intern_server(mutual_server_key)] = None
+        for user, (is_friend, mutual_friends, mutual_servers) in profiles.items():
+            graph.set_profile(user, is_friend, mutual_friends, mutual_servers)
+        return graph
+
+    def apply_record(self, record: dict) -> None:
+        """Add one crawl record, as written by ``output_writer.RecordStream``."""
+        record_type = record["type"]
+        if record_type == "server":
+            if self.find_server(record["id"]) not in self.crawled_servers:
+                self.add_crawled_server(record["id"], record["name"])
+        elif record_type == "member":
+            user = self.intern_user(record["id"], record.get("name"))
+            if "mutual_friends" in record and not self.profiled[user]:
+                self.set_profile(
+                    user,
+                    record["is_friend"],
+                    [self.intern_user(*friend) for friend in record["mutual_friends"]],
+                    [self.intern_server(*mutual_server) for mutual_server in record["mutual_servers"]],
+                )
+            self.add_member(self.find_server(record["server"]), user)
+
+    @classmethod
+    def from_tables(
+        cls,
+        user_keys: list,
+        user_names: list,
+        is_friend,
+        profiled,
+        server_keys: list,
+        server_names: list,
+        crawled_servers,
+        edges: tuple,
+    ) -> "MutualGraph":
+        """Build a graph directly from column buffers, e.g. a columnar snapshot.
+
+        ``edges`` holds the membership, mutual friend and mutual server edges,
+        each as a ``(sources, targets, indptr)`` triple of uint32/uint32/int64
+        buffers already sorted by source, so no CSR rebuild is needed.
+        """
+        graph = cls()
+        graph.user_keys = user_keys
+        graph.user_names = user_names
+        graph.server_keys = server_keys
+        graph.server_names = server_names
+        graph.is_friend = bytearray(is_friend)
+        graph.profiled = bytearray(profiled)
+        graph.crawled_servers = _array("I", crawled_servers)
+        graph._user_index = dict(zip(user_keys, range(len(user_keys))))
+        graph._server_index = dict(zip(server_keys, range(len(server_keys))))
+        graph._member_edges, graph._friend_edges, graph._mutual_server_edges = (
+            (_array("I", sources), _array("I", targets)) for sources, targets, indptr in edges
+        )
+        graph._csr = tuple(CSRAdjacency.from_buffers(indptr, targets) for sources, targets, indptr in edges)
+        return graph
+
+    @classmethod
+    def from_file(cls, path: str) -> "MutualGraph":
+        """Load a ``server_info`` JSON file or a streamed ``server_info.jsonl`` file.
+
+        Either may be gzip or zstd compressed. For JSON input the ``names.json``
+        written next to it is used for display names, if present.
+        """
+        if ".jsonl" in os.path.basename(path):
+            graph = cls()
+            for record in read_records(path):
+                graph.apply_record(record)
+            return graph
+        with open_input(path) as f:
+            server_info = json.load(f)
+        names = None
+        names_paths = glob.glob(os.path.join(glob.escape(os.path.dirname(path)), "names.json*"))
+        if names_paths:
+            with open_input(sorted(names_paths)[0]) as f:
+                names = json.load(f)
+        return cls.from_server_info(server_info, names)
+
+
+def _array(typecode: str, buffer) -> array:
+    values = array(typecode)
+    values.frombytes(memoryview(buffer).cast("B"))
+    return values
+
+
+def _parse_key(key: str):
+    return int(key) if key.isdigit() else key
@@ -0,0 +1,144 @@
+import hashlib
+import logging
+import os
+import time
+
+import numpy as np
+import scipy.sparse
+import scipy.spatial
+
+# Bump when the layout algorithm changes so cached positions are recomputed
+LAYOUT_VERSION = 1
+LAYOUT_DIR = "layouts"
+# Distance between neighbouring users placed around the same spot
+NODE_SPACING = 45
+GOLDEN_ANGLE = np.pi * (3 - np.sqrt(5))
+
+
+def layout_key(ids: list, indptr: np.ndarray, indices: np.ndarray) -> str:
+    """Hash of the node ids and user -> server adjacency the layout is computed from."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(LAYOUT_VERSION).encode())
+    digest.update("\0".join(ids).encode("utf-8"))
+    digest.update(np.ascontiguousarray(indptr, dtype=np.int64).tobytes())
+    digest.update(np.ascontiguousarray(indices, dtype=np.uint32).tobytes())
+    return digest.hexdigest()
+
+
+def force_layout(weights, iterations: int = 100, seed: int = 0, block_size: int = 512) -> np.ndarray:
+    """Fruchterman-Reingold layout of a weighted graph, vectorized over node pairs.
+
+    ``weights`` is a sparse symmetric matrix; pairwise forces are computed
+    ``block_size`` rows at a time to bound memory. Returns positions in the
+    unit square.
+    """
+    node_count = weights.shape[0]
+    if node_count == 1:
+        return np.full((1, 2), 0.5)
+    weights = scipy.sparse.csr_matrix(weights / max(weights.max(), 1))
+    positions = np.random.default_rng(seed).random((node_count, 2))
+    k = 1 / np.sqrt(node_count)
+    temperature = 0.1
+    for _ in range(iterations):
+        displacement = np.empty_like(positions)
+        for start in range(0, node_count, block_size):
+            stop = min(start + block_size, node_count)
+            delta = positions[start:stop, None, :] - positions[None, :, :]
+            distance = np.maximum(np.sqrt((delta ** 2).sum(axis=-1)), 0.01)
+            # Every pair repels; pairs sharing members attract in proportion to the overlap
+            force = k * k / distance ** 2 - weights[start:stop].toarray() * distance / k
+            force[np.arange(stop - start), np.arange(start, stop)] = 0
+            displacement[start:stop] = (force[:, :, None] * delta).sum(axis=1)
+        length = np.maximum(np.sqrt((displacement ** 2).sum(axis=1)), 1e-9)
+        positions += displacement / length[:, None] * np.minimum(length, temperature)[:, None]
+        temperature *= 0.97
+    positions -= positions.min(axis=0)
+    return positions / max(positions.max(), 1e-9)
+
+
+def remove_overlaps(positions: np.ndarray, movable: np.ndarray, distance: float, iterations: int = 50) -> np.ndarray:
+    """Push apart points closer than ``distance``; only points where ``movable`` is set are moved."""
+    positions = positions.copy()
+    for _ in range(iterations):
+        pairs = scipy.spatial.cKDTree(positions).query_pairs(distance, output_type="ndarray")
+        if not len(pairs):
+            break
+        first, second = pairs[:, 0], pairs[:, 1]
+        delta = positions[first] - positions[second]
+        length = np.sqrt((delta ** 2).sum(axis=1))
+        # Coincident points get a deterministic direction
+        delta[length == 0] = (1.0, 0.0)
+        length[length == 0] = 1.0
+        push = delta / length[:, None] * ((distance - length) / 2)[:, None]
+        # A point next to a fixed one takes the whole push
+        share_first = np.where(movable[second], 1.0, 2.0)[:, None] * movable[first][:, None]
+        share_second = np.where(movable[first], 1.0, 2.0)[:, None] * movable[second][:, None]
+        np.add.at(positions, first, push * share_first)
+        np.add.at(positions, second, -push * share_second)
+    return positions
+
+
+def bipartite_layout(user_count: int, indptr: np.ndarray, indices: np.ndarray):
+    """Positions for the users and servers of a dashboard bundle's CSR adjacency.
+
+    Servers are placed by a force layout of the server overlap graph (shared
+    members), then each user at the barycenter of their servers; users that
+    land on the same spot, e.g. members of only one server, are spread on a
+    sunflower spiral around the spot, and remaining overlaps are pushed apart.
+    """
+    server_count = len(indptr) - 1 - user_count
+    if server_count == 0:
+        return np.zeros(user_count), np.zeros(user_count)
+
+    incidence = scipy.sparse.csr_matrix(
+        (
+            np.ones(int(indptr[user_count]), dtype=np.float64),
+            indices[:indptr[user_count]].astype(np.int64) - user_count,
+            indptr[:user_count + 1],
+        ),
+        shape=(user_count, server_count),
+    )
+    overlap = incidence.T @ incidence
+    # Leaves room for the users' spirals between the servers
+    extent = max(1200.0, 6 * NODE_SPACING * np.sqrt(user_count))
+    servers = force_layout(overlap) * extent
+
+    degrees = np.diff(indptr[:user_count + 1])
+    users = incidence @ servers / np.maximum(degrees, 1)[:, None]
+    if user_count:
+        # Users whose barycenters fall in the same grid cell share a spiral
+        _, spot = np.unique(np.floor(users / (4 * NODE_SPACING)), axis=0, return_inverse=True)
+        spot = spot.ravel()
+        order = np.argsort(spot, kind="stable")
+        spot_starts = np.searchsorted(spot[order], spot[order])
+        rank = np.empty(user_count)
+        rank[order] = np.arange(user_count) - spot_starts + 1
+        spot_sizes = np.bincount(spot)
+        centers = np.stack([np.bincount(spot, users[:, axis]) / spot_sizes for axis in (0, 1)], axis=1)
+        radius = NODE_SPACING * np.sqrt(rank)
+        users = centers[spot]
+        users[:, 0] += radius * np.cos(rank * GOLDEN_ANGLE)
+        users[:, 1] += radius * np.sin(rank * GOLDEN_ANGLE)
+
+    movable = np.arange(user_count + server_count) < user_count
+    positions = remove_overlaps(np.concatenate([users, servers]), movable, NODE_SPACING)
+    return positions[:, 0].copy(), positions[:, 1].copy()
+
+
+def cached_layout(ids: list, user_count: int, indptr: np.ndarray, indices: np.ndarray, cache_dir: str = None):
+    """``bipartite_layout`` positions, read from or saved to ``cache_dir/layouts`` by ``layout_key``."""
+    if cache_dir is None:
+        return bipartite_layout(user_count, indptr, indices)
+    path = os.path.join(cache_dir, LAYOUT_DIR, layout_key(ids, indptr, indices) + ".npy")
+    if os.path.exists(path):
+        positions = np.load(path)
+        return positions[0], positions[1]
+    start = time.perf_counter()
+    x, y = bipartite_layout(user_count, indptr, indices)
+    logging.info(f"Laid out {len(ids)} nodes in {time.perf_counter() - start:.1f}s")
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.save(path, np.stack([x, y]))
+    except OSError as e:
+        logging.warning(f"Could not cache the graph layout at {path}: {e}")
+    return x, y
@@ -3,13 +3,26 @@ import json
 import logging
 import os
 import sys
-import asyncio
+import time
+import heapq
 import requests
+import numpy as np
 import web_ui
 
 import discord
 from dotenv import load_dotenv
 from get_token import get_token
+from graph_core import MutualGraph
+from profile_cache import Profile, ProfileCache
+from crawl_journal import CrawlJournal
+from crawl_metrics import CrawlMetrics, MetricsExporter
+from progress import ProgressReporter, log_progress
+from rate_limit import RateLimitScheduler, with_retries
+from output_writer import RecordStream, compressed_path, read_records, write_json
+import snapshot
+import snapshot_diff
+import analytics
+from dashboard_bundle import BUNDLE_FILE
 
 
 def resource_path(relative_path):
@@ -21,8 +34,12 @@ def resource_path(relative_path):
         base_path = os.path.abspath(".")
     return os.path.join(base_path, relative_path)
 
+
+DISCORD_API_BASE = "https://discord.com/api/v9"
+
+
 def get_user_guilds_fast(token):
-    url = "https://discord.com/api/v9/users/@me/guilds"
+    url = f"{DISCORD_API_BASE}/users/@me/guilds"
     headers = {
         "Authorization": token,
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -36,6 +53,20 @@ def get_user_guilds_fast(token):
     return server_list
 
 
+def crawl_client_options() -> dict:
+    """``discord.Client`` options for a low-footprint crawl.
+
+    No message cache, and no member cache beyond the guild's own member:
+    ``get_server_info`` fetches the members of each server itself instead of
+    reading them from a cache kept for the whole session.
+    """
+    return {
+        "max_messages": None,
+        "member_cache_flags": discord.MemberCacheFlags.none(),
+        "chunk_guilds_at_startup": False,
+    }
+
+
 class MyClient(discord.Client):
     def __init__(
         self,
@@ -49,9 +80,23 @@ class MyClient(discord.Client):
         max_members,
         period_max_members,
         pause_duration,
-        show_mutual_server_graph
+        show_mutual_server_graph,
+        profile_cache=None,
+        journal=None,
+        output_format="json",
+        compression=None,
+        stream_output=None,
+        snapshot_format=None,
+        analytics=False,
+        max_graph_elements=web_ui.MAX_GRAPH_ELEMENTS,
+        top_k=None,
+        low_memory=False,
+        metrics_port=None,
+        stats_file=None,
+        stats_interval=10.0,
+        progress_interval=5.0,
     ):
-        super().__init__()
+        super().__init__(**(crawl_client_options() if low_memory else {}))
         self.sleep_time = sleep_time
         self.output_verbosity = output_verbosity
         self.print_info = print_info
@@ -63,192 +108,267 @@ class MyClient(discord.Client):
         self.period_max_members = period_max_members
         self.pause_duration = pause_duration
         self.show_mutual_server_graph = show_mutual_server_graph
+        self.profile_cache = profile_cache
+        self.journal = journal
+        self.output_format = output_format
+        self.compression = compression
+        self.stream_output = stream_output
+        self.snapshot_format = snapshot_format
+        self.analytics = analytics
+        self.max_graph_elements = max_graph_elements
+        self.top_k = top_k
+        self.metrics = CrawlMetrics()
+        self.metrics_exporter = MetricsExporter(self.metrics, metrics_port, stats_file, stats_interval)
+        self.rate_limiter = RateLimitScheduler(sleep_time, self.metrics)
+        # Set when the scheduler cannot attach, to sleep sleep_time before every profile request instead
+        self.fixed_pacing = False
+        self.progress = ProgressReporter(progress_interval, listeners=[log_progress, self.metrics.set_progress])
+        self.record_streams = [stream for stream in (journal, stream_output) if stream]
         print("MyClient initialized successfully")
 
     async def on_ready(self) -> None:
-        friend_ids = self.get_friend_ids(self)
-        server_info = await self.get_server_info(
-            self,
-            friend_ids,
-            self.sleep_time,
-            self.include_servers,
-            self.include_channels,
-            self.max_members,
-            self.period_max_members,
-            self.pause_duration,
-        )
-        friends = self.get_friends(server_info)
-        mutual_friends = self.get_mutual_friends(server_info, self.output_verbosity)
-        mutual_servers = self.get_mutual_servers(server_info, self.output_verbosity)
-
-        if self.print_info:
-            self.print_client_info(server_info, friends, mutual_friends, mutual_servers)
-
-        if self.write_to_json:
-            self.write_data_to_json(
-                server_info, friends, mutual_friends, mutual_servers, self.output_path
-            )
+        await self.metrics_exporter.start()
+        try:
+            self.fixed_pacing = not self.rate_limiter.attach(self.http)
+            bundle = await self.crawl_and_write()
+        finally:
+            await self.metrics_exporter.stop()
 
         if self.show_mutual_server_graph:
             print("\nLaunching web UI dashboard...")
             print("Web server will start at http://localhost:8050")
             await self.close()  # Close Discord client first
-            users_to_servers = web_ui.remap_servers_to_adjacency_matrix(server_info)
             try:
-                web_ui.run_web_server(users_to_servers)
+                web_ui.run_web_server(bundle, max_elements=self.max_graph_elements)
             except KeyboardInterrupt:
                 print("\nWeb server stopped.")
         else:
             await self.close()
 
+    async def crawl_and_write(self):
+        """Crawl the servers and write the selected outputs; returns the dashboard bundle, if one was built."""
+        bundle = None
+        friend_ids = self.get_friend_ids(self)
+        graph = await self.get_server_info(
+            self,
+            friend_ids,
+            self.include_servers,
+            self.include_channels,
+            self.max_members,
+            self.period_max_members,
+            self.pause_duration,
+        )
+        for stream in self.record_streams:
+            stream.close()
+
+        if self.print_info or self.write_to_json:
+            # In jsonl mode server_info was already streamed during the crawl, so it is never built
+            server_info = graph.to_server_info() if self.output_format == "json" else None
+            with self.metrics.timer("rank_outputs"):
+                names = graph.to_names()
+                friends = self.get_friends(graph)
+                mutual_friends = self.get_mutual_friends(graph, self.output_verbosity)
+                mutual_servers = self.get_mutual_servers(graph, self.output_verbosity)
+
+            if self.print_info:
+                self.print_client_info(server_info, friends, mutual_friends, mutual_servers, names)
+
+            if self.write_to_json:
+                with self.metrics.timer("write_json"):
+                    self.write_data_to_json(
+                        server_info, friends, mutual_friends, mutual_servers, names, self.output_path
+                    )
+
+        if self.snapshot_format:
+            with self.metrics.timer("write_snapshot"):
+                snapshot_path = snapshot.write_snapshot(
+                    graph, os.path.join(self.output_path, "snapshot"), self.snapshot_format
+                )
+            print(f"Snapshot written to {snapshot_path}")
+
+        if self.analytics:
+            with self.metrics.timer("analytics"):
+                analytics_paths = analytics.write_analytics(
+                    graph,
+                    self.output_path,
+                    k=analytics.ANALYTICS_TOP_K if self.top_k is None else self.top_k,
+                    compression=self.compression,
+                    compact=self.output_format == "jsonl",
+                )
+            print(f"Analytics written to {', '.join(analytics_paths)}")
+
+        if self.write_to_json or self.show_mutual_server_graph:
+            with self.metrics.timer("dashboard_bundle"):
+                bundle = web_ui.build_bundle(graph, self.output_path if self.write_to_json else None)
+                if self.write_to_json:
+                    bundle.sources = [
+                        compressed_path(f"server_info.{self.output_format}", self.compression)
+                    ]
+                    if self.snapshot_format:
+                        bundle.sources.append("snapshot")
+                    bundle.write(os.path.join(self.output_path, BUNDLE_FILE))
+        return bundle
+
     def get_friend_ids(self, client: discord.Client) -> set:
         friend_ids = set()
         for friend in self.friends:
             friend_ids.add(friend.user.id)
         return friend_ids
 
-    def get_friends(self, server_info: dict) -> dict:
+    def get_friends(self, graph: MutualGraph) -> dict:
         friends = dict()
-        for server in server_info:
-            friends[server] = list()
-            for member in server_info[server]:
-                if server_info[server][member]["is_friend"]:
-                    friends[server].append(member)
+        members = graph.members
+        for server in graph.crawled_servers:
+            friends[graph.server_id(server)] = [
+                graph.user_id(user) for user in members[server] if graph.is_friend[user]
+            ]
         return friends
 
-    def get_mutual_friends(self, server_info: dict, output_verbosity: int) -> dict:
+    def get_mutual_friends(self, graph: MutualGraph, output_verbosity: int) -> dict:
         mutual_friends = dict()
-        for server in server_info:
-            mutual_friends[server] = list()
-            for member in server_info[server]:
-                if server_info[server][member]["mutual_friends"]:
-                    mutual_friends[server].append(
-                        (
-                            -len(server_info[server][member]["mutual_friends"]),
-                            member,
-                            server_info[server][member]["mutual_friends"],
-                        )
-                    )
-            mutual_friends[server].sort()
-            if output_verbosity == 1:
-                mutual_friends[server] = [
-                    member
-                    for mutual_friends_count, member, mutual_friends_list in mutual_friends[
-                        server
-                    ]
-                ]
-            elif output_verbosity == 2:
-                mutual_friends[server] = [
-                    (member, -mutual_friends_count)
-                    for mutual_friends_count, member, mutual_friends_list in mutual_friends[
-                        server
-                    ]
-                ]
-            elif output_verbosity == 3:
-                mutual_friends[server] = [
-                    (member, -mutual_friends_count, mutual_friends_list)
-                    for mutual_friends_count, member, mutual_friends_list in mutual_friends[
-                        server
-                    ]
-                ]
+        members = graph.members
+        adjacency = graph.mutual_friends
+        indptr = np.frombuffer(adjacency.indptr, dtype=np.int64)
+        for server in graph.crawled_servers:
+            users = np.frombuffer(members[server], dtype=np.uint32).astype(np.int64)
+            ranked = self.rank_members(graph, users, indptr[users + 1] - indptr[users])
+            mutual_friends[graph.server_id(server)] = self.project_ranking(
+                ranked,
+                output_verbosity,
+                lambda user: [graph.user_id(friend) for friend in adjacency[user]],
+            )
         return mutual_friends
 
-    def get_mutual_servers(self, server_info: dict, output_verbosity: int) -> dict:
+    def get_mutual_servers(self, graph: MutualGraph, output_verbosity: int) -> dict:
         mutual_servers = dict()
-        for server in server_info:
-            mutual_servers[server] = list()
-            for member in server_info[server]:
-                if server_info[server][member]["mutual_servers"]:
-                    mutual_servers[server].append(
-                        (
-                            -len(server_info[server][member]["mutual_servers"]),
-                            member,
-                            server_info[server][member]["mutual_servers"],
-                        )
-                    )
-            mutual_servers[server].sort()
-            if output_verbosity == 1:
-                mutual_servers[server] = [
-                    member
-                    for mutual_servers_count, member, mutual_servers_list in mutual_servers[
-                        server
-                    ]
-                ]
-            elif output_verbosity == 2:
-                mutual_servers[server] = [
-                    (member, -mutual_servers_count)
-                    for mutual_servers_count, member, mutual_servers_list in mutual_servers[
-                        server
-                    ]
-                ]
-            elif output_verbosity == 3:
-                mutual_servers[server] = [
-                    (member, -mutual_servers_count, mutual_servers_list)
-                    for mutual_servers_count, member, mutual_servers_list in mutual_servers[
-                        server
-                    ]
-                ]
+        members = graph.members
+        adjacency = graph.mutual_servers
+        indptr = np.frombuffer(adjacency.indptr, dtype=np.int64)
+        indices = np.frombuffer(adjacency.indices, dtype=np.uint32)
+        for server in graph.crawled_servers:
+            users = np.frombuffer(members[server], dtype=np.uint32).astype(np.int64)
+            starts = indptr[users]
+            degrees = indptr[users + 1] - starts
+            # A member's mutual servers exclude the server being listed
+            offsets = np.cumsum(degrees) - degrees
+            positions = np.repeat(starts - offsets, degrees) + np.arange(int(degrees.sum()))
+            listed = np.bincount(
+                np.repeat(np.arange(len(users)), degrees),
+                weights=indices[positions] == server,
+                minlength=len(users),
+            )
+            ranked = self.rank_members(graph, users, degrees - listed.astype(np.int64))
+            mutual_servers[graph.server_id(server)] = self.project_ranking(
+                ranked,
+                output_verbosity,
+                lambda user: [
+                    graph.server_id(mutual_server) for mutual_server in adjacency[user] if mutual_server != server
+                ],
+            )
         return mutual_servers
 
-    def print_client_info(self, server_info, friends, mutual_friends, mutual_servers):
+    def rank_members(self, graph: MutualGraph, users: np.ndarray, counts: np.ndarray) -> list:
+        """``(-count, member id, user)`` for members with a nonzero count, most first, ties by id.
+
+        With ``top_k`` set, ``np.argpartition`` finds the k-th largest count and a
+        bounded heap orders the members at or above it, so a server is never
+        fully sorted.
+        """
+        keep = counts > 0
+        users, counts = users[keep], counts[keep]
+        if self.top_k is None:
+            return sorted(zip((-counts).tolist(), map(graph.user_id, users.tolist()), users.tolist()))
+        if len(counts) > self.top_k:
+            threshold = counts[np.argpartition(counts, len(counts) - self.top_k)[len(counts) - self.top_k]]
+            candidates = counts >= threshold
+            users, counts = users[candidates], counts[candidates]
+        return heapq.nsmallest(
+            self.top_k, zip((-counts).tolist(), map(graph.user_id, users.tolist()), users.tolist())
+        )
+
+    def project_ranking(self, ranked: list, output_verbosity: int, expand) -> list:
+        # Member lists are only expanded for the members that made the ranking
+        if output_verbosity == 1:
+            return [member for count, member, node in ranked]
+        elif output_verbosity == 2:
+            return [(member, -count) for count, member, node in ranked]
+        return [(member, -count, expand(node)) for count, member, node in ranked]
+
+    def print_client_info(self, server_info, friends, mutual_friends, mutual_servers, names):
         print("Server Info:")
-        print(json.dumps(server_info, indent=4))
+        if server_info is None:
+            print(f"Streamed to {self.stream_output.path}" if self.stream_output else "Not built with --output_format jsonl")
+        else:
+            print(json.dumps(server_info, indent=4))
         print("\nFriends:")
         print(json.dumps(friends, indent=4))
         print("\nMutual Friends:")
         print(json.dumps(mutual_friends, indent=4))
         print("\nMutual Servers:")
         print(json.dumps(mutual_servers, indent=4))
+        print("\nNames:")
+        print(json.dumps(names, indent=4))
 
     def write_data_to_json(
-        self, server_info, friends, mutual_friends, mutual_servers, output_path
+        self, server_info, friends, mutual_friends, mutual_servers, names, output_path
     ):
         os.makedirs(output_path, exist_ok=True)
-        with open(os.path.join(output_path, "server_info.json"), "w") as f:
-            json.dump(server_info, f, indent=4)
-        with open(os.path.join(output_path, "friends.json"), "w") as f:
-            json.dump(friends, f, indent=4)
-        with open(os.path.join(output_path, "mutual_friends.json"), "w") as f:
-            json.dump(mutual_friends, f, indent=4)
-        with open(os.path.join(output_path, "mutual_servers.json"), "w") as f:
-            json.dump(mutual_servers, f, indent=4)
+        outputs = {
+            "server_info": server_info,
+            "friends": friends,
+            "mutual_friends": mutual_friends,
+            "mutual_servers": mutual_servers,
+            "names": names,
+        }
+        for name, data in outputs.items():
+            if data is None:
+                continue
+            write_json(
+                data,
+                os.path.join(output_path, f"{name}.json"),
+                self.compression,
+                compact=self.output_format == "jsonl",
+            )
 
     async def get_server_info(
         self,
         client: discord.Client,
         friend_ids: set,
-        sleep_time: float,
         include_servers: set,
         include_channels: set,
         max_members: int,
         period_max_members: int,
         pause_duration: int,
-    ) -> dict:
+    ) -> MutualGraph:
+        def backoff(seconds: float):
+            return self.metrics.sleep("backoff", seconds)
+
         async def fetch_members_with_retry(server, channels=None):
             try:
                 if channels:
-                    return set(await server.fetch_members(channels=channels))
+                    return await with_retries(lambda: server.fetch_members(channels=channels), sleep=backoff)
                 else:
-                    return set(await server.fetch_members())
-            except discord.HTTPException as e:
-                if e.status == 429:
-                    retry_after = int(e.response.headers.get("Retry-After", 1))
-                    logging.warning(
-                        f"Rate limited. Retrying after {retry_after} seconds."
-                    )
-                    await asyncio.sleep(retry_after)
-                    return await fetch_members_with_retry(server, channels)
-                else:
-                    logging.error(f"Failed to fetch members: {e}")
-                    return set()
+                    return await with_retries(server.fetch_members, sleep=backoff)
+            except (discord.HTTPException, discord.RateLimited) as e:
+                logging.error(f"Failed to fetch members: {e}")
+                return []
             except RuntimeError as e:
                 logging.warning(f"Cannot fetch members for {server.name}: {e}")
-                return set()
+                return []
+
+        def add_members(server_members: dict, members) -> int:
+            # Only IDs and names are kept, so the Member objects can be freed
+            for member in members:
+                if member.id not in server_members:
+                    server_members[member.id] = str(member)
+            return len(members)
 
         user_servers = await client.fetch_guilds()
         servers_count = len(user_servers)
-        server_info = dict()
-        seen_members = dict()
+        graph = MutualGraph()
+        if self.journal:
+            self.journal.replay(graph)
+        seen_members = {user for user in range(graph.user_count) if graph.profiled[user]}
         include_servers = set(include_servers)
         include_channels = set(include_channels)
         specific_server_count = 0
@@ -266,30 +386,38 @@ class MyClient(discord.Client):
                     matched_servers.add(server_name)
                     specific_server_count += 1
 
+            if self.journal and server.id in self.journal.completed_servers:
+                logging.info(f"Skipping {server_name}, already completed in the crawl journal")
+                continue
+
+            enumeration_start = time.perf_counter()
+            server_members = {}
             if include_channels:
                 channels = [
                     discord.utils.get(server.channels, name=channel)
                     for channel in include_channels
                 ]
-                fetch_server_members = await fetch_members_with_retry(server, channels)
+                fetch_server_members = add_members(
+                    server_members, await fetch_members_with_retry(server, channels)
+                )
             else:
-                fetch_server_members = await fetch_members_with_retry(server)
-
+                fetch_server_members = add_members(server_members, await fetch_members_with_retry(server))
+            guild_server_members = add_members(server_members, server.members)
             try:
-                chunked_server_members = set(await server.chunk())
+                chunked_server_members = add_members(server_members, await server.chunk(cache=False))
             except Exception:
                 logging.info("server.fetch_members() failed")
-                chunked_server_members = set()
-            guild_server_members = set(server.members)
-            server_members = list(
-                fetch_server_members.union(guild_server_members).union(
-                    chunked_server_members
-                )
+                chunked_server_members = 0
+            # (id, name) pairs in the order the members were first seen
+            server_members = list(server_members.items())
+            self.metrics.observe_guild(
+                server.id, server_name, time.perf_counter() - enumeration_start, len(server_members)
             )
 
-            print(f"fetch_server_members: {len(fetch_server_members)}")
-            print(f"guild_server_members: {len(guild_server_members)}")
-            print(f"chunked_server_members: {len(chunked_server_members)}")
+            logging.info(
+                f"Found {len(server_members)} members in {server_name}: {fetch_server_members} fetched, "
+                f"{guild_server_members} cached, {chunked_server_members} chunked"
+            )
 
             server_member_count = len(server_members)
             if server_member_count > max_members:
@@ -299,110 +427,158 @@ class MyClient(discord.Client):
 
             selected_server_member_count = min(server_member_count, max_members)
 
-            server_info[server_name] = dict()
+            if self.journal and server.id in self.journal.started_servers:
+                server_node = graph.find_server(server.id)
+                done_members = self.journal.server_progress[server.id]
+            else:
+                server_node = graph.add_crawled_server(server.id, server_name)
+                done_members = set()
+                for stream in self.record_streams:
+                    stream.record_server(server.id, server_name)
+
+            if include_servers:
+                self.progress.start_server(
+                    server_name, specific_server_count, len(include_servers), selected_server_member_count
+                )
+            else:
+                self.progress.start_server(server_name, server_idx + 1, servers_count, selected_server_member_count)
 
             for start_idx in range(0, selected_server_member_count, period_max_members):
                 end_idx = min(
                     start_idx + period_max_members, selected_server_member_count
                 )
+                fetched_members = 0
                 for member_idx in range(start_idx, end_idx):
-                    member = server_members[member_idx]
+                    member_id, member_name = server_members[member_idx]
 
-                    if include_servers:
-                        logging.info(
-                            f"Processing {server.name} server, progress = {specific_server_count}/{len(include_servers)} servers {member_idx + 1}/{selected_server_member_count} members"
-                        )
-                    else:
-                        logging.info(
-                            f"Processing {server.name} server, progress = {server_idx + 1}/{servers_count} servers {member_idx + 1}/{selected_server_member_count} members"
-                        )
-                    if member.id == client.user.id:
+                    self.progress.advance()
+                    if member_id == client.user.id or member_id in done_members:
                         continue
 
-                    member_name = f"{member.name}#{member.discriminator}"
+                    user_node = graph.intern_user(member_id, member_name)
 
-                    if member_name in seen_members:
-                        server_info[server_name][member_name] = dict()
-                        server_info[server_name][member_name]["is_friend"] = (
-                            seen_members[member_name]["is_friend"]
-                        )
-                        server_info[server_name][member_name]["mutual_friends"] = (
-                            seen_members[member_name]["mutual_friends"]
-                        )
-
-                        server_info[server_name][member_name]["mutual_servers"] = (
-                            seen_members[member_name]["mutual_servers"]
-                        )
+                    if user_node in seen_members:
+                        # The profile is stored once on the user node; only the
+                        # membership edge is new for this server.
+                        if graph.profiled[user_node]:
+                            graph.add_member(server_node, user_node)
+                            for stream in self.record_streams:
+                                stream.record_member(server.id, member_id, member_name)
                         continue
                     else:
-                        seen_members[member_name] = dict()
+                        seen_members.add(user_node)
 
-                    try:
-                        member_profile = await server.fetch_member_profile(
-                            member.id,
-                            with_mutual_guilds=True,
-                            with_mutual_friends=True,
-                        )
-                    except (discord.errors.NotFound, discord.errors.InvalidData):
-                        logging.warning(
-                            f"Member {member_name} not found or invalid. Skipping."
-                        )
-                        continue
-                    except discord.errors.HTTPException as e:
-                        logging.warning(
-                            f"HTTP error fetching profile for {member_name}: {e}. Skipping."
-                        )
-                        continue
-                    except Exception as e:
-                        logging.error(
-                            f"Unexpected error fetching profile for {member_name}: {e}."
-                        )
-                        continue
-
-                    server_info[server_name][member_name] = dict()
-
-                    mutual_friend_names = []
-                    mutual_server_names = []
-                    mutual_friends = member_profile.mutual_friends
-                    mutual_servers = member_profile.mutual_guilds
-
-                    if member.id in friend_ids:
-                        server_info[server_name][member_name]["is_friend"] = True
-                        seen_members[member_name]["is_friend"] = True
-                    else:
-                        server_info[server_name][member_name]["is_friend"] = False
-                        seen_members[member_name]["is_friend"] = False
-
-                    for friend in mutual_friends:
-                        friend_name = f"{friend.name}#{friend.discriminator}"
-                        mutual_friend_names.append(friend_name)
-
-                    server_info[server_name][member_name]["mutual_friends"] = (
-                        mutual_friend_names
+                    profile = (
+                        self.profile_cache.get(member_id) if self.profile_cache else None
                     )
-                    seen_members[member_name]["mutual_friends"] = mutual_friend_names
-
-                    for mutual_server in mutual_servers:
-                        if mutual_server.id != server.id:
-                            mutual_server_names.append(mutual_server.guild.name)
-
-                    server_info[server_name][member_name]["mutual_servers"] = (
-                        mutual_server_names
+                    if self.profile_cache:
+                        self.metrics.count("cache_miss" if profile is None else "cache_hit")
+                    if profile is None:
+                        if self.fixed_pacing:
+                            await self.metrics.sleep("rate_limit", self.sleep_time)
+                        fetch_start = time.perf_counter()
+                        try:
+                            member_profile = await with_retries(
+                                lambda: server.fetch_member_profile(
+                                    member_id,
+                                    with_mutual_guilds=True,
+                                    with_mutual_friends=True,
+                                ),
+                                sleep=backoff,
+                            )
+                        except (discord.errors.NotFound, discord.errors.InvalidData):
+                            logging.warning(
+                                f"Member {member_name} not found or invalid. Skipping."
+                            )
+                            self.metrics.count("profile_not_found")
+                            continue
+                        except (discord.errors.HTTPException, discord.errors.RateLimited) as e:
+                            logging.warning(
+                                f"HTTP error fetching profile for {member_name}: {e}. Skipping."
+                            )
+                            self.metrics.count("profile_http_error")
+                            continue
+                        except Exception as e:
+                            logging.error(
+                                f"Unexpected error fetching profile for {member_name}: {e}."
+                            )
+                            self.metrics.count("profile_error")
+                            continue
+                        self.metrics.observe_profile(time.perf_counter() - fetch_start)
+                        self.metrics.count("profile_fetched")
+
+                        profile = Profile(
+                            [
+                                (friend.id, str(friend))
+                                for friend in member_profile.mutual_friends
+                            ],
+                            [
+                                (
+                                    mutual_server.id,
+                                    mutual_server.guild.name if mutual_server.guild else None,
+                                )
+                                for mutual_server in member_profile.mutual_guilds
+                            ],
+                        )
+                        if self.profile_cache:
+                            self.profile_cache.put(member_id, profile)
+                        fetched_members += 1
+
+                    graph.set_profile(
+                        user_node,
+                        member_id in friend_ids,
+                        [graph.intern_user(*friend) for friend in profile.mutual_friends],
+                        [graph.intern_server(*mutual_server) for mutual_server in profile.mutual_servers],
                     )
+                    graph.add_member(server_node, user_node)
+                    for stream in self.record_streams:
+                        stream.record_member(
+                            server.id, member_id, member_name, member_id in friend_ids, profile
+                        )
 
-                    seen_members[member_name]["mutual_servers"] = mutual_server_names
-
-                    await asyncio.sleep(sleep_time)
+                # Cached profiles cost no requests, so only pause after periods that fetched
+                if fetched_members and pause_duration:
+                    logging.info(f"Pausing for {pause_duration} seconds...")
+                    await self.metrics.sleep("pause", pause_duration)
 
-                logging.info(f"Pausing for {pause_duration} seconds...")
-                await asyncio.sleep(pause_duration)
+            for stream in self.record_streams:
+                stream.record_server_done(server.id)
+            self.metrics.count("server_done")
+            release_member_cache(server, client.user.id)
 
+        self.progress.finish()
         unmatched_servers = include_servers.difference(matched_servers)
         if unmatched_servers:
             logging.warning(
                 f"Did not find the following servers: {unmatched_servers} consider choosing from the following servers: {seen_servers}"
             )
-        return server_info
+        return graph
+
+
+def open_stream_output(output_path: str, compression: str, journal: CrawlJournal = None) -> RecordStream:
+    """The ``server_info.jsonl`` stream; when resuming it is rewritten from the journal.
+
+    The interrupted run's stream may have lost its unflushed tail, while the
+    fsynced journal holds every record, so the stream is never appended to.
+    """
+    stream_output = RecordStream(
+        compressed_path(os.path.join(output_path, "server_info.jsonl"), compression), compression
+    )
+    if journal and journal.resume:
+        stream_output.write_records(read_records(journal.path))
+    return stream_output
+
+
+def release_member_cache(server: discord.Guild, keep_id: int) -> None:
+    """Drop a processed guild's cached members, except ``keep_id``, so only one guild's members are held at a time."""
+    # discord.py-self has no public way to evict members; Guild._remove_member is checked against 2.1.0
+    remove_member = getattr(server, "_remove_member", None)
+    if remove_member is None:
+        logging.warning(f"Cannot release the member cache of {server.name}: this discord.py-self version has no Guild._remove_member")
+        return
+    for member in list(server.members):
+        if member.id != keep_id:
+            remove_member(member)
 
 
 def check_positive_float(original_value):
@@ -415,13 +591,23 @@ def check_positive_float(original_value):
     return value
 
 
+def check_positive_int(original_value):
+    try:
+        value = int(original_value)
+        if value <= 0:
+            raise argparse.ArgumentTypeError(f"{original_value} is not a positive")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{original_value} is not an int")
+    return value
+
+
 def add_arguments(parser: argparse.ArgumentParser, output_path=str):
     parser.add_argument(
         "-s",
         "--sleep_time",
         default=3.0,
         type=check_positive_float,
-        help="How long to sleep between each member request. With values lower than 3, rate limits tend to be hit, which may lead to a ban. Increase if you hit a rate limit. Example --sleep_time 4, default=3",
+        help="Seconds between requests to a route until Discord reports its rate limit. After that requests are paced by the X-RateLimit headers of the responses, and 429s are waited out and retried. If the installed discord.py-self cannot be hooked, every profile request waits sleep_time instead. Example --sleep_time 4, default=3",
     )
 
     parser.add_argument(
@@ -441,6 +627,13 @@ def add_arguments(parser: argparse.ArgumentParser, output_path=str):
         help="How much information to be included in the mutual friends and mutual servers files. 1 means just the member name. 2 means the member name and a count the member's of mutual friends or mutual servers. 3 means the member name and a list of the member's mutual friends or mutual servers. Example --output_verbosity 3, default=2",
     )
 
+    parser.add_argument(
+        "--top_k",
+        default=None,
+        type=check_positive_int,
+        help="Only keep the top k members with the most mutual friends or mutual servers per server in the mutual friends and mutual servers files, and the top k neighbours per node in the --analytics files. Example --top_k 50, default=None",
+    )
+
     parser.add_argument(
         "-p",
         "--print_info",
@@ -503,8 +696,89 @@ def add_arguments(parser: argparse.ArgumentParser, output_path=str):
     parser.add_argument(
         "--pause_duration",
         type=int,
-        default=300,
-        help="Pause duration between periods in seconds. Example --pause_duration 300, default=300",
+        default=0,
+        help="Extra pause in seconds after each period of --period_max_members members. Requests are already paced by Discord's rate limits, so this is off by default. Example --pause_duration 300, default=0",
+    )
+
+    parser.add_argument(
+        "--output_format",
+        default="json",
+        choices=["json", "jsonl"],
+        help="Format of the output files. json writes indented JSON files at the end of the run. jsonl streams server_info.jsonl, one compact record per server and member, while the crawl runs and writes the other files as compact JSON. Example --output_format jsonl, default=json",
+    )
+
+    parser.add_argument(
+        "--compression",
+        default=None,
+        choices=["gzip", "zstd"],
+        help="Compress the output files. zstd requires the zstandard package. Example --compression gzip, default=none",
+    )
+
+    parser.add_argument(
+        "--snapshot",
+        default=None,
+        choices=list(snapshot.SNAPSHOT_FORMATS),
+        help="Also write the graph as columnar tables (users, servers, membership, mutual_friends, mutual_servers) to output_path/snapshot, as memory-mappable Arrow IPC or Parquet files. The snapshot directory can be passed to --web_ui_only. Example --snapshot arrow, default=none",
+    )
+
+    parser.add_argument(
+        "--analytics",
+        action="store_true",
+        help="Also write overlap analytics to output_path/analytics: for each server the servers sharing the most members (with Jaccard similarity), and for each user the users sharing the most servers",
+    )
+
+    parser.add_argument(
+        "--profile_cache",
+        type=str,
+        default=None,
+        metavar="SQLITE_FILE",
+        help="Location of the profile cache. Member profiles fetched within --cache_max_age are reused instead of requested again. Example --profile_cache cache.sqlite3, default=output_path+'profile_cache.sqlite3'",
+    )
+
+    parser.add_argument(
+        "--cache_max_age",
+        type=float,
+        default=24.0,
+        help="How many hours a cached member profile stays valid. 0 disables the cache. Example --cache_max_age 168, default=24",
+    )
+
+    parser.add_argument(
+        "--low_memory",
+        action="store_true",
+        help="Run the Discord client without a message cache or member cache, so memory stays flat on long crawls of accounts in many guilds. Members are then only found through member requests, not from members the client has already seen",
+    )
+
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted crawl from the crawl journal in the output path instead of starting over. Completed servers are skipped and already processed members are not fetched again",
+    )
+
+    parser.add_argument(
+        "--metrics_port",
+        type=int,
+        default=None,
+        help="Serve crawl metrics (enumeration and profile fetch times, cache hits, rate limits, sleeps and post-processing stages) in the Prometheus text format at http://localhost:PORT/metrics while the crawl runs. Example --metrics_port 9100, default=None",
+    )
+
+    parser.add_argument(
+        "--stats_file",
+        default=None,
+        help="Write the crawl metrics as JSON to this file every --stats_interval seconds and when the crawl finishes. Example --stats_file output/crawl_stats.json, default=None",
+    )
+
+    parser.add_argument(
+        "--stats_interval",
+        type=check_positive_float,
+        default=10.0,
+        help="Seconds between writes of --stats_file. Example --stats_interval 60, default=10",
+    )
+
+    parser.add_argument(
+        "--progress_interval",
+        type=check_positive_float,
+        default=5.0,
+        help="Most seconds between crawl progress updates, which are logged at info level with throughput and ETA and published in the crawl metrics. Progress is also reported every 500 members. Example --progress_interval 30, default=5",
     )
 
     parser.add_argument(
@@ -521,7 +795,19 @@ def add_arguments(parser: argparse.ArgumentParser, output_path=str):
         "--web_ui_only",
         type=str,
         metavar="JSON_FILE",
-        help="Launch web UI directly from a previously saved JSON file (skips Discord data collection)"
+        help="Launch web UI directly from a previously saved server_info JSON/JSONL file or snapshot directory (skips Discord data collection)"
+    )
+    parser.add_argument(
+        "--diff",
+        nargs=2,
+        metavar=("OLD", "NEW"),
+        help="Compare two crawls, each a snapshot directory or server_info JSON/JSONL file, by ID and write the users, servers and edges added and removed between them to output_path/diff.json (skips Discord data collection). Example --diff output/old/snapshot output/snapshot",
+    )
+    parser.add_argument(
+        "--max_graph_elements",
+        type=int,
+        default=web_ui.MAX_GRAPH_ELEMENTS,
+        help="Most nodes and edges the web UI draws at once. Larger graphs start with servers only, their members collapsed into one node per server, and draw a server's members when it is clicked. Example --max_graph_elements 20000, default=10000",
     )
 
 
@@ -552,26 +838,59 @@ if __name__ == "__main__":
             idx+=1
         exit(0)
 
+    if args.diff:
+        old_path, new_path = args.diff
+        for path in args.diff:
+            if not os.path.exists(path):
+                print(f"Error: '{path}' not found!")
+                exit(1)
+        diff = snapshot_diff.diff_graphs(snapshot.load_graph(old_path), snapshot.load_graph(new_path))
+        print(snapshot_diff.summarize(diff))
+        diff["changed_users"] = sorted(snapshot_diff.changed_users(diff))
+        os.makedirs(args.output_path, exist_ok=True)
+        diff_path = write_json(
+            diff,
+            os.path.join(args.output_path, snapshot_diff.DIFF_FILE),
+            args.compression,
+            compact=True,
+        )
+        print(f"Diff written to {diff_path}")
+        exit(0)
+
     # If web-ui-only mode, launch the web UI directly with existing JSON data
     if hasattr(args, 'web_ui_only') and args.web_ui_only:
         if not os.path.exists(args.web_ui_only):
-            print(f"Error: JSON file '{args.web_ui_only}' not found!")
+            print(f"Error: '{args.web_ui_only}' not found!")
             exit(1)
 
         print(f"Loading data from {args.web_ui_only}...")
-        with open(args.web_ui_only, 'r') as f:
-            mutual_servers = json.load(f)
-
-        users_to_servers = web_ui.remap_servers_to_adjacency_matrix(mutual_servers)
+        bundle = web_ui.load_dashboard(args.web_ui_only)
         print("Starting web UI at http://localhost:8050")
         print("Press Ctrl+C to stop the server")
 
         try:
-            web_ui.run_web_server(users_to_servers)
+            web_ui.run_web_server(bundle, max_elements=args.max_graph_elements)
         except KeyboardInterrupt:
             print("\nWeb server stopped.")
         exit(0)
 
+    profile_cache = None
+    if args.cache_max_age > 0:
+        os.makedirs(args.output_path, exist_ok=True)
+        profile_cache = ProfileCache(
+            args.profile_cache or os.path.join(args.output_path, "profile_cache.sqlite3"),
+            args.cache_max_age * 3600,
+        )
+
+    os.makedirs(args.output_path, exist_ok=True)
+    journal = CrawlJournal(
+        os.path.join(args.output_path, "crawl_journal.jsonl"), resume=args.resume
+    )
+
+    stream_output = None
+    if args.write_to_json and args.output_format == "jsonl":
+        stream_output = open_stream_output(args.output_path, args.compression, journal)
+
     client = MyClient(
         sleep_time=args.sleep_time,
         output_verbosity=args.output_verbosity,
@@ -583,6 +902,20 @@ if __name__ == "__main__":
         max_members=args.max_members,
         period_max_members=args.period_max_members,
         pause_duration=args.pause_duration,
-        show_mutual_server_graph=args.mutual_server_graph
+        show_mutual_server_graph=args.mutual_server_graph,
+        profile_cache=profile_cache,
+        journal=journal,
+        output_format=args.output_format,
+        compression=args.compression,
+        stream_output=stream_output,
+        snapshot_format=args.snapshot,
+        analytics=args.analytics,
+        max_graph_elements=args.max_graph_elements,
+        top_k=args.top_k,
+        low_memory=args.low_memory,
+        metrics_port=args.metrics_port,
+        stats_file=args.stats_file,
+        stats_interval=args.stats_interval,
+        progress_interval=args.progress_interval,
     )
     client.run(token)
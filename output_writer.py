@@ -0,0 +1,107 @@
+import gzip
+import io
+import json
+import logging
+import os
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_SUFFIXES = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+
+def compressed_path(path: str, compression: str = None) -> str:
+    return path + COMPRESSION_SUFFIXES[compression]
+
+
+def open_output(path: str, compression: str = None, append: bool = False):
+    """Open a text file for writing, compressed with gzip or zstd if requested.
+
+    ``path`` is used as given; see ``compressed_path`` for the matching suffix.
+    """
+    mode = "at" if append else "wt"
+    if compression == "gzip":
+        return gzip.open(path, mode, encoding="utf-8")
+    if compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd compression requires the zstandard package: pip install zstandard")
+        return zstandard.open(path, mode, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def open_input(path: str):
+    """Open a text file for reading, decompressing based on its .gz/.zst suffix."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError("Reading .zst files requires the zstandard package: pip install zstandard")
+        # Appending to a .zst file adds a frame per session, so read across all of them
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True)
+        return io.TextIOWrapper(reader, encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def write_json(data, path: str, compression: str = None, compact: bool = False) -> str:
+    """Dump ``data`` to ``path`` (plus compression suffix) and return the path written."""
+    path = compressed_path(path, compression)
+    with open_output(path, compression) as f:
+        if compact:
+            json.dump(data, f, separators=(",", ":"))
+        else:
+            json.dump(data, f, indent=4)
+    return path
+
+
+class RecordStream:
+    """Compact JSONL stream of crawl records, written while the crawl runs.
+
+    One line is written when a server is started, one per processed member
+    (carrying the member's profile the first time they are seen) and one when
+    the server is finished. With ``durable`` every line is fsynced as well.
+    """
+
+    def __init__(self, path: str, compression: str = None, append: bool = False, durable: bool = False):
+        self.path = path
+        self.durable = durable and compression is None
+        self.file = open_output(path, compression, append)
+
+    def _write(self, record: dict) -> None:
+        self.file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        if self.durable:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def write_records(self, records) -> None:
+        for record in records:
+            self._write(record)
+
+    def record_server(self, server_id: int, name: str) -> None:
+        self._write({"type": "server", "id": server_id, "name": name})
+
+    def record_member(self, server_id: int, user_id: int, name: str, is_friend=None, profile=None) -> None:
+        record = {"type": "member", "server": server_id, "id": user_id, "name": name}
+        if profile is not None:
+            record["is_friend"] = is_friend
+            record["mutual_friends"] = profile.mutual_friends
+            record["mutual_servers"] = profile.mutual_servers
+        self._write(record)
+
+    def record_server_done(self, server_id: int) -> None:
+        self._write({"type": "server_done", "id": server_id})
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def read_records(path: str):
+    """Yield the records of a RecordStream file, skipping a partially written last line."""
+    with open_input(path) as f:
+        for line_number, line in enumerate(f, 1):
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # A crash mid-write leaves a partial last line
+                logging.warning(f"Ignoring unreadable line {line_number} of {path}")
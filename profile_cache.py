@@ -0,0 +1,62 @@
+import json
+import sqlite3
+import time
+from typing import NamedTuple
+
+
+class Profile(NamedTuple):
+    # (id, name) pairs, as read from the member's profile
+    mutual_friends: list
+    mutual_servers: list
+
+
+class ProfileCache:
+    """SQLite store of fetched member profiles, keyed by user ID.
+
+    Each row records when the profile was fetched; rows older than ``max_age``
+    seconds are treated as missing so the crawl fetches them again.
+    """
+
+    def __init__(self, path: str, max_age: float):
+        self.path = path
+        self.max_age = max_age
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS profiles ("
+            "user_id INTEGER PRIMARY KEY, "
+            "fetched_at REAL NOT NULL, "
+            "mutual_friends TEXT NOT NULL, "
+            "mutual_servers TEXT NOT NULL)"
+        )
+        self.connection.commit()
+
+    def get(self, user_id: int):
+        row = self.connection.execute(
+            "SELECT fetched_at, mutual_friends, mutual_servers FROM profiles WHERE user_id = ?",
+            (user_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        fetched_at, mutual_friends, mutual_servers = row
+        if time.time() - fetched_at > self.max_age:
+            return None
+        return Profile(
+            [tuple(friend) for friend in json.loads(mutual_friends)],
+            [tuple(server) for server in json.loads(mutual_servers)],
+        )
+
+    def put(self, user_id: int, profile: Profile) -> None:
+        self.connection.execute(
+            "INSERT OR REPLACE INTO profiles (user_id, fetched_at, mutual_friends, mutual_servers) "
+            "VALUES (?, ?, ?, ?)",
+            (
+                user_id,
+                time.time(),
+                json.dumps(profile.mutual_friends, separators=(",", ":")),
+                json.dumps(profile.mutual_servers, separators=(",", ":")),
+            ),
+        )
+        self.connection.commit()
+
+    def close(self) -> None:
+        self.connection.close()
@@ -0,0 +1,89 @@
+import logging
+import time
+
+# Members between progress updates, whatever the interval
+PROGRESS_EVERY = 500
+
+
+class ProgressReporter:
+    """Crawl progress pushed to listeners at a bounded rate.
+
+    ``advance`` is called once per member and only bumps a counter and
+    compares it and the clock to the next update; the progress ``state`` is
+    built, with throughput and ETA, at most every ``every`` members or
+    ``interval`` seconds and then passed to each listener.
+    """
+
+    def __init__(self, interval: float = 5.0, every: int = PROGRESS_EVERY, listeners=()):
+        self.interval = interval
+        self.every = every
+        self.listeners = list(listeners)
+        self.state = {}
+        self.server = None
+        self.server_position = 0
+        self.server_count = 0
+        self.server_members = 0
+        self.server_done = 0
+        self.members_done = 0
+        self.started = time.monotonic()
+        self._next_count = every
+        self._next_time = self.started + interval
+        self._last_count = 0
+        self._last_time = self.started
+
+    def start_server(self, name: str, position: int, server_count: int, member_count: int) -> None:
+        self.server = name
+        self.server_position = position
+        self.server_count = server_count
+        self.server_members = member_count
+        self.server_done = 0
+        self.publish()
+
+    def advance(self, members: int = 1) -> None:
+        self.members_done += members
+        self.server_done += members
+        if self.members_done >= self._next_count or time.monotonic() >= self._next_time:
+            self.publish()
+
+    def publish(self, finished: bool = False) -> None:
+        now = time.monotonic()
+        elapsed = now - self._last_time
+        # Throughput since the previous update, so the ETA follows pauses and cache hits
+        rate = (self.members_done - self._last_count) / elapsed if elapsed > 0 else 0.0
+        remaining = self.server_members - self.server_done
+        self.state = {
+            "server": self.server,
+            "server_position": self.server_position,
+            "server_count": self.server_count,
+            "server_members_done": self.server_done,
+            "server_members": self.server_members,
+            "members_done": self.members_done,
+            "members_per_second": rate,
+            "server_eta_seconds": remaining / rate if rate > 0 else None,
+            "elapsed_seconds": now - self.started,
+            "finished": finished,
+        }
+        self._last_count, self._last_time = self.members_done, now
+        self._next_count = self.members_done + self.every
+        self._next_time = now + self.interval
+        for listener in self.listeners:
+            listener(self.state)
+
+    def finish(self) -> None:
+        self.publish(finished=True)
+
+
+def format_progress(state: dict) -> str:
+    if state["finished"]:
+        return f"Finished: {state['members_done']} members in {state['elapsed_seconds']:.0f}s"
+    eta = state["server_eta_seconds"]
+    return (
+        f"Processing {state['server']} server, progress = {state['server_position']}/{state['server_count']} servers "
+        f"{state['server_members_done']}/{state['server_members']} members, "
+        f"{state['members_per_second']:.1f} members/s"
+        + (f", ETA {eta:.0f}s" if eta is not None else "")
+    )
+
+
+def log_progress(state: dict) -> None:
+    logging.info(format_progress(state))
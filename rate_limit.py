@@ -0,0 +1,192 @@
+import asyncio
+import json
+import logging
+import re
+import time
+
+import discord
+
+# Retries of a request the library gave up on after 429s
+MAX_RETRIES = 5
+# Snowflakes in a URL, replaced so requests to the same route share a key
+SNOWFLAKE = re.compile(r"\d{15,}")
+
+
+class Bucket:
+    __slots__ = ("limit", "remaining", "reset_at", "retry_at")
+
+    def __init__(self, limit: int, remaining: int, reset_at: float):
+        self.limit = limit
+        self.remaining = remaining
+        # time.monotonic() at which the bucket refills to limit
+        self.reset_at = reset_at
+        # time.monotonic() before which a 429 on the route forbids requests
+        self.retry_at = 0.0
+
+
+class RateLimitScheduler:
+    """Paces REST requests by the rate limit buckets Discord reports.
+
+    Every response's ``X-RateLimit-Limit``, ``-Remaining`` and ``-Reset-After``
+    headers update a token bucket for its route, and a request waits only when
+    its bucket is empty, until the bucket resets. A 429 blocks its route (or,
+    for a global limit, every route) for its float Retry-After. Routes
+    that have not reported a bucket yet are spaced ``fallback_interval``
+    seconds apart.
+
+    ``attach`` relies on discord.py-self internals, checked against 2.1.0;
+    without them requests are only spaced by a fixed interval.
+    """
+
+    def __init__(self, fallback_interval: float = 0.0, metrics=None):
+        self.fallback_interval = fallback_interval
+        self.metrics = metrics
+        # Route key -> X-RateLimit-Bucket hash, for routes sharing a bucket
+        self.bucket_hashes = {}
+        self.buckets = {}
+        self.global_reset_at = 0.0
+        self._next_unknown = {}
+        self._session = None
+
+    def route_key(self, method: str, url: str) -> str:
+        return f"{method} {SNOWFLAKE.sub('{id}', url.split('?', 1)[0])}"
+
+    def bucket(self, key: str):
+        return self.buckets.get(self.bucket_hashes.get(key, key))
+
+    def delay(self, key: str, now: float) -> float:
+        """Seconds a request on ``key`` has to wait at ``now``."""
+        wait = self.global_reset_at - now
+        bucket = self.bucket(key)
+        if bucket is None:
+            return max(wait, self._next_unknown.get(key, 0.0) - now)
+        wait = max(wait, bucket.retry_at - now)
+        if bucket.remaining <= 0:
+            return max(wait, bucket.reset_at - now)
+        return wait
+
+    async def acquire(self, key: str) -> None:
+        while True:
+            now = time.monotonic()
+            wait = self.delay(key, now)
+            if wait <= 0:
+                break
+            if self.metrics:
+                await self.metrics.sleep("rate_limit", wait)
+            else:
+                await asyncio.sleep(wait)
+        bucket = self.bucket(key)
+        if bucket is None:
+            self._next_unknown[key] = now + self.fallback_interval
+            return
+        if bucket.remaining <= 0:
+            bucket.remaining = bucket.limit
+        bucket.remaining -= 1
+
+    def update(self, key: str, status: int, headers, data=None) -> None:
+        """Record a response on ``key``; ``data`` is the decoded body of a 429."""
+        now = time.monotonic()
+        bucket_hash = headers.get("X-RateLimit-Bucket")
+        if bucket_hash:
+            self.bucket_hashes[key] = bucket_hash
+        name = self.bucket_hashes.get(key, key)
+        if status == 429:
+            if self.metrics:
+                self.metrics.count("rate_limited")
+            data = data if isinstance(data, dict) else {}
+            retry = retry_after_seconds(data, headers)
+            if (
+                data.get("global")
+                or headers.get("X-RateLimit-Global") == "true"
+                or headers.get("X-RateLimit-Scope") == "global"
+            ):
+                self.global_reset_at = now + retry
+                return
+            bucket = self.buckets.get(name)
+            if bucket is None:
+                # Still paced by fallback_interval once the Retry-After has passed
+                self._next_unknown[key] = max(self._next_unknown.get(key, 0.0), now + retry)
+            else:
+                bucket.retry_at = now + retry
+        elif "X-RateLimit-Remaining" in headers:
+            limit = int(headers.get("X-RateLimit-Limit", 1))
+            remaining = int(headers["X-RateLimit-Remaining"])
+            reset_at = now + float(headers.get("X-RateLimit-Reset-After", 0))
+            bucket = self.buckets.get(name)
+            if bucket is None:
+                self.buckets[name] = Bucket(limit, remaining, reset_at)
+            else:
+                bucket.limit, bucket.remaining, bucket.reset_at = limit, remaining, reset_at
+
+    def attach(self, http: discord.http.HTTPClient) -> bool:
+        """Route the REST requests of a started ``HTTPClient`` through the scheduler.
+
+        The library keeps its own buckets but does not expose the responses,
+        so its session's ``request`` is wrapped. Attaching again, as happens
+        when ``on_ready`` fires after a reconnect, only wraps a new session.
+        Returns False if the session cannot be found, in which case the caller
+        has to pace its requests itself.
+        """
+        # The name-mangled curl_cffi session of discord.py-self 2.1.0's HTTPClient
+        session = getattr(http, "_HTTPClient__session", None)
+        if not callable(getattr(session, "request", None)):
+            logging.warning(
+                "Cannot pace requests by the rate limit headers: this discord.py-self version has no "
+                f"HTTPClient.__session. Falling back to {self.fallback_interval} seconds between profile requests."
+            )
+            return False
+        if session is self._session:
+            return True
+        self._session = session
+        request = session.request
+
+        async def paced_request(method, url, **kwargs):
+            key = self.route_key(method, url)
+            await self.acquire(key)
+            response = await request(method, url, **kwargs)
+            data = None
+            if response.status_code == 429:
+                # The body is streamed; read it once and hand the same bytes back to the library
+                body = await response.acontent()
+
+                async def acontent():
+                    return body
+
+                response.acontent = acontent
+                try:
+                    data = json.loads(body)
+                except ValueError:
+                    pass
+            self.update(key, response.status_code, response.headers, data)
+            return response
+
+        session.request = paced_request
+        return True
+
+
+def retry_after_seconds(data: dict, headers) -> float:
+    """A 429's wait: the body's float retry_after, else X-RateLimit-Reset-After, else Retry-After."""
+    if data.get("retry_after") is not None:
+        return float(data["retry_after"])
+    return float(headers.get("X-RateLimit-Reset-After") or headers.get("Retry-After") or 1)
+
+
+def retry_after(error: Exception) -> float:
+    """Seconds to wait before retrying a rate limited request, from the 429 body or headers."""
+    if isinstance(error, discord.RateLimited):
+        return error.retry_after
+    data = getattr(error, "json", None)
+    return retry_after_seconds(data if isinstance(data, dict) else {}, error.response.headers)
+
+
+async def with_retries(request, retries: int = MAX_RETRIES, sleep=asyncio.sleep):
+    """Await ``request()``, retrying up to ``retries`` times after each 429 once its Retry-After has passed."""
+    for attempt in range(retries + 1):
+        try:
+            return await request()
+        except (discord.HTTPException, discord.RateLimited) as e:
+            if getattr(e, "status", 429) != 429 or attempt == retries:
+                raise
+            delay = retry_after(e)
+        logging.warning(f"Rate limited. Retrying after {delay:.2f} seconds.")
+        await sleep(delay)
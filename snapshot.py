@@ -0,0 +1,127 @@
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.parquet as pq
+
+from graph_core import CSRAdjacency, MutualGraph
+
+SNAPSHOT_FORMATS = {"arrow": ".arrow", "parquet": ".parquet"}
+
+# Edge tables reference users and servers by row number in the node tables
+EDGE_TABLES = (
+    ("membership", "server", "user"),
+    ("mutual_friends", "user", "friend"),
+    ("mutual_servers", "user", "server"),
+)
+
+
+def _key_column(keys: list) -> pa.Array:
+    try:
+        return pa.array(keys)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Name keys from old JSON files mixed with numeric-looking names
+        return pa.array([str(key) for key in keys])
+
+
+def _edge_columns(adjacency: CSRAdjacency):
+    indptr = np.frombuffer(adjacency.indptr, dtype=np.int64)
+    targets = np.frombuffer(adjacency.indices, dtype=np.uint32)
+    sources = np.repeat(np.arange(len(indptr) - 1, dtype=np.uint32), np.diff(indptr))
+    return sources, targets
+
+
+def graph_to_tables(graph: MutualGraph) -> dict:
+    crawl_order = np.full(graph.server_count, -1, dtype=np.int32)
+    crawl_order[np.frombuffer(graph.crawled_servers, dtype=np.uint32)] = np.arange(
+        len(graph.crawled_servers), dtype=np.int32
+    )
+    tables = {
+        "users": pa.table({
+            "id": _key_column(graph.user_keys),
+            "name": pa.array(graph.user_names, type=pa.string()),
+            "is_friend": pa.array(np.frombuffer(graph.is_friend, dtype=np.uint8).astype(bool)),
+            "profiled": pa.array(np.frombuffer(graph.profiled, dtype=np.uint8).astype(bool)),
+        }),
+        "servers": pa.table({
+            "id": _key_column(graph.server_keys),
+            "name": pa.array(graph.server_names, type=pa.string()),
+            "crawl_order": pa.array(crawl_order),
+        }),
+    }
+    adjacencies = (graph.members, graph.mutual_friends, graph.mutual_servers)
+    for (table_name, source_name, target_name), adjacency in zip(EDGE_TABLES, adjacencies):
+        sources, targets = _edge_columns(adjacency)
+        tables[table_name] = pa.table({source_name: sources, target_name: targets})
+    return tables
+
+
+def write_snapshot(graph: MutualGraph, path: str, file_format: str = "arrow") -> str:
+    """Write the graph as columnar node and edge tables, one file per table, into ``path``."""
+    os.makedirs(path, exist_ok=True)
+    suffix = SNAPSHOT_FORMATS[file_format]
+    for name, table in graph_to_tables(graph).items():
+        table_path = os.path.join(path, name + suffix)
+        if file_format == "parquet":
+            pq.write_table(table, table_path)
+        else:
+            with pa.OSFile(table_path, "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+    return path
+
+
+def _read_table(path: str, name: str) -> pa.Table:
+    arrow_path = os.path.join(path, name + SNAPSHOT_FORMATS["arrow"])
+    if os.path.exists(arrow_path):
+        # Memory-mapped, so the columns are read without copying the file
+        return pa.ipc.open_file(pa.memory_map(arrow_path, "r")).read_all()
+    return pq.read_table(os.path.join(path, name + SNAPSHOT_FORMATS["parquet"]), memory_map=True)
+
+
+def _column(table: pa.Table, name: str, dtype) -> np.ndarray:
+    return np.ascontiguousarray(table.column(name).to_numpy(), dtype=dtype)
+
+
+def is_snapshot(path: str) -> bool:
+    return os.path.isdir(path) and any(
+        os.path.exists(os.path.join(path, "users" + suffix)) for suffix in SNAPSHOT_FORMATS.values()
+    )
+
+
+def read_snapshot(path: str) -> MutualGraph:
+    users = _read_table(path, "users")
+    servers = _read_table(path, "servers")
+    crawl_order = _column(servers, "crawl_order", np.int32)
+    crawled = np.flatnonzero(crawl_order >= 0)
+    crawled_servers = crawled[np.argsort(crawl_order[crawled])].astype(np.uint32)
+
+    edges = []
+    for (table_name, source_name, target_name), rows in zip(
+        EDGE_TABLES, (servers.num_rows, users.num_rows, users.num_rows)
+    ):
+        table = _read_table(path, table_name)
+        sources = _column(table, source_name, np.uint32)
+        targets = _column(table, target_name, np.uint32)
+        indptr = np.zeros(rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=rows), out=indptr[1:])
+        edges.append((sources, targets, indptr))
+
+    return MutualGraph.from_tables(
+        users.column("id").to_pylist(),
+        users.column("name").to_pylist(),
+        _column(users, "is_friend", np.uint8),
+        _column(users, "profiled", np.uint8),
+        servers.column("id").to_pylist(),
+        servers.column("name").to_pylist(),
+        crawled_servers,
+        tuple(edges),
+    )
+
+
+def load_graph(path: str) -> MutualGraph:
+    """Load a columnar snapshot directory, or a server_info JSON/JSONL file."""
+    if is_snapshot(path):
+        return read_snapshot(path)
+    return MutualGraph.from_file(path)
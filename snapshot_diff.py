@@ -0,0 +1,108 @@
+import numpy as np
+
+from graph_core import CSRAdjacency, MutualGraph
+from snapshot import EDGE_TABLES
+
+DIFF_FILE = "diff.json"
+
+
+def _key_arrays(old_keys: list, new_keys: list):
+    try:
+        return np.asarray(old_keys, dtype=np.int64), np.asarray(new_keys, dtype=np.int64)
+    except (TypeError, ValueError, OverflowError):
+        # Name keys from old JSON files
+        return np.asarray([str(key) for key in old_keys]), np.asarray([str(key) for key in new_keys])
+
+
+def _shared_codes(old_keys: list, new_keys: list):
+    """Sorted union of both snapshots' keys and each snapshot's row -> union position."""
+    old, new = _key_arrays(old_keys, new_keys)
+    keys, codes = np.unique(np.concatenate([old, new]), return_inverse=True)
+    codes = codes.ravel().astype(np.int64)
+    return keys, codes[:len(old)], codes[len(old):]
+
+
+def _edge_codes(adjacency: CSRAdjacency, source_codes: np.ndarray, target_codes: np.ndarray, target_count: int):
+    """Each edge as one sorted int64, ``source * target_count + target`` in the shared key space."""
+    indptr = np.frombuffer(adjacency.indptr, dtype=np.int64)
+    targets = np.frombuffer(adjacency.indices, dtype=np.uint32)
+    sources = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    return np.unique(source_codes[sources] * target_count + target_codes[targets])
+
+
+def _changes(old: np.ndarray, new: np.ndarray) -> tuple:
+    return np.setdiff1d(new, old, assume_unique=True), np.setdiff1d(old, new, assume_unique=True)
+
+
+def diff_graphs(old: MutualGraph, new: MutualGraph) -> dict:
+    """Users, servers and edges added and removed between two crawls, matched by ID.
+
+    Both graphs' IDs are mapped into one sorted key space and every edge table
+    is encoded as a sorted array of integers, so each comparison is a single
+    vectorized set difference. Edges are ``[source, target]`` ID pairs, in the
+    column order of the snapshot tables.
+    """
+    user_keys, old_users, new_users = _shared_codes(old.user_keys, new.user_keys)
+    server_keys, old_servers, new_servers = _shared_codes(old.server_keys, new.server_keys)
+    keys = {"user": user_keys, "friend": user_keys, "server": server_keys}
+    codes = {"user": (old_users, new_users), "server": (old_servers, new_servers)}
+    codes["friend"] = codes["user"]
+
+    def ids(key_array, positions) -> list:
+        return [str(key) for key in key_array[positions].tolist()]
+
+    diff = {}
+    for name, key_array, old_codes, new_codes in (
+        ("users", user_keys, old_users, new_users),
+        ("servers", server_keys, old_servers, new_servers),
+    ):
+        added, removed = _changes(np.unique(old_codes), np.unique(new_codes))
+        diff[name] = {"added": ids(key_array, added), "removed": ids(key_array, removed)}
+
+    crawled = (
+        np.unique(old_servers[np.frombuffer(old.crawled_servers, dtype=np.uint32)]),
+        np.unique(new_servers[np.frombuffer(new.crawled_servers, dtype=np.uint32)]),
+    )
+    added, removed = _changes(*crawled)
+    diff["crawled_servers"] = {"added": ids(server_keys, added), "removed": ids(server_keys, removed)}
+
+    for (table_name, source_name, target_name), old_adjacency, new_adjacency in zip(
+        EDGE_TABLES,
+        (old.members, old.mutual_friends, old.mutual_servers),
+        (new.members, new.mutual_friends, new.mutual_servers),
+    ):
+        target_count = len(keys[target_name])
+        added, removed = _changes(
+            _edge_codes(old_adjacency, codes[source_name][0], codes[target_name][0], target_count),
+            _edge_codes(new_adjacency, codes[source_name][1], codes[target_name][1], target_count),
+        )
+        diff[table_name] = {
+            change: [
+                list(pair)
+                for pair in zip(ids(keys[source_name], edges // target_count), ids(keys[target_name], edges % target_count))
+            ]
+            for change, edges in (("added", added), ("removed", removed))
+        }
+    return diff
+
+
+def changed_users(diff: dict) -> set:
+    """IDs of the users whose profile differs between the two crawls.
+
+    These are new users and users who joined or left a crawled server or
+    gained or lost a mutual friend or mutual server; the profiles of every
+    other user can be reused instead of fetched again.
+    """
+    users = set(diff["users"]["added"])
+    for table_name, _, _ in EDGE_TABLES:
+        # Membership edges are (server, user) pairs, the others start at the user
+        user_column = 1 if table_name == "membership" else 0
+        for change in ("added", "removed"):
+            users.update(edge[user_column] for edge in diff[table_name][change])
+    return users - set(diff["users"]["removed"])
+
+
+def summarize(diff: dict) -> str:
+    return "\n".join(
+        f"{name}: +{len(changes['added'])} -{len(changes['removed'])}" for name, changes in diff.items()
+    )
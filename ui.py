@@ -7,6 +7,7 @@ from tkinter import ttk
 
 from get_token import get_token
 from main import MyClient
+from progress import format_progress
 import threading
 
 class Colors:
@@ -218,7 +219,7 @@ def get_arguments():
     question_mark_sleep_time.pack(side="left")
     ToolTip(
         question_mark_sleep_time,
-        "How long to sleep between each member request. With values lower than 2, rate limits tend to be hit, which may lead to a ban. Increase if you hit a rate limit.",
+        "Seconds between requests until Discord reports its rate limits. After that requests are paced by the rate limits Discord sends back.",
     )
 
     print_info_frame = ttk.Frame(content_frame)
@@ -490,7 +491,6 @@ class LoadingScreen:
         self.progress = ttk.Progressbar(self.root, orient="horizontal", length=300, mode='determinate')
         self.progress.place(y= 250, x = 30)
         # self.progress.pack(pady=(10, 20))  # Some padding to give space from the label
-        self.progress.start(100)
 
     def configure_styles(self):
         style = ttk.Style()
@@ -515,18 +515,32 @@ class LoadingScreen:
     def update_message(self, message, fg_color=Colors.FG_COLOR):
             self.message_label.config(text=message, fg=fg_color)  # Update the label with the new message and foreground color
 
-def run_client(args, loading_screen):
+    def watch(self, reporter, interval_ms=500):
+        """Show the latest state of a ProgressReporter, polled from the Tk loop since the crawl runs in another thread."""
+        state = reporter.state
+        if state:
+            self.message_label.config(text=format_progress(state), wraplength=300)
+            if state["server_members"]:
+                self.progress["value"] = 100 * state["server_members_done"] / state["server_members"]
+        self.root.after(interval_ms, self.watch, reporter, interval_ms)
+
+def create_client(args):
+    return MyClient(
+        sleep_time=args["sleep_time"],
+        output_verbosity=args["output_verbosity"],
+        print_info=args["print_info"],
+        write_to_json=args["write_to_json"],
+        output_path=args["output_path"],
+        include_servers=args["include_servers"],
+        include_channels=args["include_channels"],
+        max_members=args["max_members"] or sys.maxsize,
+        period_max_members=100,
+        pause_duration=0,
+        show_mutual_server_graph=False,
+    )
+
+def run_client(client, args, loading_screen):
     try:
-        client = MyClient(
-            sleep_time=args["sleep_time"],
-            output_verbosity=args["output_verbosity"],
-            print_info=args["print_info"],
-            write_to_json=args["write_to_json"],
-            output_path=args["output_path"],
-            include_servers=args["include_servers"],
-            include_channels=args["include_channels"],
-            max_members=args["max_members"]
-        )
         client.run(args["token"])
     except Exception as e:
         loading_screen.update_message("Token validation failed.", Colors.FG_COLOR)
@@ -620,8 +634,10 @@ if __name__ == "__main__":
     loading_screen = LoadingScreen()
     loading_screen.show()
 
-    # Start the client in a background thread
-    client_thread = threading.Thread(target=run_client, args=(args, loading_screen))
+    # Start the client in a background thread; the loading screen follows its progress
+    client = create_client(args)
+    loading_screen.watch(client.progress)
+    client_thread = threading.Thread(target=run_client, args=(client, args, loading_screen))
     client_thread.start()
 
     # Start the Tkinter loop for the loading screen
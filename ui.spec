@@ -5,7 +5,7 @@ a = Analysis(
     ['ui.py'],
     pathex=[],
     binaries=[],
-    datas=[('icon.png', '.'), ('get_token.py', '.'), ('main.py', '.')],
+    datas=[('icon.png', '.'), ('get_token.py', '.'), ('main.py', '.'), ('assets', 'assets')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
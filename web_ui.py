@@ -1,264 +1,329 @@
 import dash
 from dash import html, callback_context
-from dash.dependencies import Input, Output, State
-from dashboard import create_stylesheet, build_dash_layout, create_graph_elements
+from dash.dependencies import ClientsideFunction, Input, Output, State
+from dash.exceptions import PreventUpdate
+import numpy as np
+import logging
+import os
+from dashboard import (
+    create_stylesheet,
+    create_selection_stylesheet,
+    build_dash_layout,
+    create_graph_elements,
+    create_cluster_elements,
+)
+from dashboard_bundle import DashboardBundle, bundle_path_for, source_name
+from analytics import incidence_from_bundle, top_comembers, top_similar_servers
+from graph_core import MutualGraph
+from snapshot import load_graph
 
-def remap_servers_to_adjacency_matrix(mutual_servers):
+def remap_servers_to_adjacency_matrix(graph: MutualGraph):
+    members = graph.members
+    mutual_servers = graph.mutual_servers
     users_to_servers = {}
-    for server_name, members in mutual_servers.items():
-        for member_name, info in members.items():
-            # Remove everything after and including the hashtag
-            clean_name = member_name.split('#')[0]
-            if clean_name not in users_to_servers:
-                users_to_servers[clean_name] = set()
-            users_to_servers[clean_name].add(server_name)
-            users_to_servers[clean_name].update(info.get("mutual_servers", []))
+    for server in graph.crawled_servers:
+        for user in members[server]:
+            user_id = graph.user_id(user)
+            if user_id not in users_to_servers:
+                users_to_servers[user_id] = set()
+            users_to_servers[user_id].add(graph.server_id(server))
+            users_to_servers[user_id].update(
+                graph.server_id(mutual_server) for mutual_server in mutual_servers[user]
+            )
     users_to_servers = {user: sorted(list(servers)) for user, servers in users_to_servers.items()}
     return users_to_servers
 
-def create_app(users_to_servers):
-    app = dash.Dash(__name__)
-    app.title = "Discord Connections"
-    elements = create_graph_elements(users_to_servers)
-    stylesheet = create_stylesheet()
-    app.layout = build_dash_layout(elements, stylesheet)
+def node_labels(graph: MutualGraph):
+    labels = {graph.user_id(user): name for user, name in enumerate(graph.user_names)}
+    labels.update({graph.server_id(server): name for server, name in enumerate(graph.server_names)})
+    return labels
 
-    @app.callback(
-        [Output("discord-graph", "stylesheet"), Output("node-info", "children")],
-        [Input("discord-graph", "tapNodeData"), Input("deselect-button", "n_clicks")],
-        [State("discord-graph", "elements")]
+def build_bundle(graph: MutualGraph, layout_dir=None):
+    return DashboardBundle.from_users_to_servers(
+        remap_servers_to_adjacency_matrix(graph), node_labels(graph), layout_dir
     )
-    def update_graph_on_node_click(clicked_node_data, n_clicks, elements):
-        base_stylesheet = create_stylesheet()
-        ctx = callback_context
-        triggered = ctx.triggered[0]["prop_id"] if ctx.triggered else None
 
-        # If deselect button was clicked, clear selection, restore base
-        if triggered and triggered.startswith("deselect-button"):
-            info_content = [
-                html.H3("Guide", style={
-                    "margin": "0 0 1rem 0",
-                    "color": "#f9fafb",
-                    "fontSize": "1.125rem",
-                    "fontWeight": "600",
-                }),
-                html.Div([
-                    html.P("Click any node to see connections",
-                          style={"margin": "0 0 0.75rem 0", "color": "#9ca3af", "fontSize": "0.875rem"}),
-                    html.P("Blue = Users",
-                          style={"margin": "0 0 0.5rem 0", "color": "#3b82f6", "fontSize": "0.875rem", "fontWeight": "500"}),
-                    html.P("Green = Servers",
-                          style={"margin": "0 0 0.5rem 0", "color": "#10b981", "fontSize": "0.875rem", "fontWeight": "500"}),
-                    html.P("Red = You",
-                          style={"margin": "0 0 1rem 0", "color": "#ef4444", "fontSize": "0.875rem", "fontWeight": "500"}),
-                ]),
-                html.Hr(style={"border": "none", "borderTop": "1px solid #374151", "margin": "1rem 0"}),
-                html.H4("Stats", style={
-                    "margin": "0 0 0.75rem 0",
-                    "color": "#f9fafb",
-                    "fontSize": "1rem",
-                    "fontWeight": "600",
-                }),
-                html.P(f"Users: {len(users_to_servers)}",
-                      style={"margin": "0 0 0.5rem 0", "color": "#9ca3af", "fontSize": "0.875rem"}),
-                html.P(f"Servers: {len({srv for lst in users_to_servers.values() for srv in lst})}",
-                      style={"margin": "0 0 0.5rem 0", "color": "#9ca3af", "fontSize": "0.875rem"}),
-                html.P(f"Connections: {sum(len(servers) for servers in users_to_servers.values())}",
-                      style={"margin": "0", "color": "#9ca3af", "fontSize": "0.875rem"}),
-            ]
-            return base_stylesheet, info_content
+def load_dashboard(path):
+    """Load the dashboard bundle for a crawl output, building and caching it if missing or stale."""
+    if os.path.isfile(path) and path.endswith(".arrow"):
+        return DashboardBundle.read(path)
+    bundle_path = bundle_path_for(path)
+    if os.path.exists(bundle_path) and os.path.getmtime(bundle_path) >= os.path.getmtime(path):
+        bundle = DashboardBundle.read(bundle_path)
+        if source_name(path) in bundle.sources:
+            return bundle
+    bundle = build_bundle(load_graph(path), os.path.dirname(bundle_path))
+    bundle.sources = [source_name(path)]
+    try:
+        bundle.write(bundle_path)
+    except OSError as e:
+        logging.warning(f"Could not cache the dashboard bundle at {bundle_path}: {e}")
+    return bundle
 
-        if not clicked_node_data:
-            info_content = [
-                html.H3("Guide", style={
-                    "margin": "0 0 1rem 0",
-                    "color": "#f9fafb",
-                    "fontSize": "1.125rem",
-                    "fontWeight": "600",
-                }),
-                html.Div([
-                    html.P("Click any node to see connections",
-                          style={"margin": "0 0 0.75rem 0", "color": "#9ca3af", "fontSize": "0.875rem"}),
-                    html.P("Blue = Users",
-                          style={"margin": "0 0 0.5rem 0", "color": "#3b82f6", "fontSize": "0.875rem", "fontWeight": "500"}),
-                    html.P("Green = Servers",
-                          style={"margin": "0 0 0.5rem 0", "color": "#10b981", "fontSize": "0.875rem", "fontWeight": "500"}),
-                    html.P("Red = You",
-                          style={"margin": "0 0 1rem 0", "color": "#ef4444", "fontSize": "0.875rem", "fontWeight": "500"}),
-                ]),
-                html.Hr(style={"border": "none", "borderTop": "1px solid #374151", "margin": "1rem 0"}),
-                html.H4("Servers", style={
-                    "margin": "0 0 0.75rem 0",
-                    "color": "#f9fafb",
-                    "fontSize": "1rem",
-                    "fontWeight": "600",
-                }),
-                html.Div([
-                    *[html.Div([
-                        html.P(server, style={
-                            "margin": "0",
-                            "color": "#10b981",
-                            "fontSize": "0.875rem",
-                            "fontWeight": "500",
-                        }),
-                        html.P(f"{sum(1 for user_servers in users_to_servers.values() if server in user_servers)} members",
-                              style={"margin": "0", "color": "#6b7280", "fontSize": "0.5rem"}),
-                    ], style={
-                        "padding": "0.5rem",
-                        "margin": "0 0 0.5rem 0",
-                        "backgroundColor": "#1f2937",
-                        "borderRadius": "0.375rem",
-                        "border": "1px solid #374151",
-                        "cursor": "pointer",
-                    }) for server in sorted({srv for lst in users_to_servers.values() for srv in lst})],
-                ]),
-                html.H4("Stats", style={
-                    "margin": "0 0 0.75rem 0",
-                    "color": "#f9fafb",
-                    "fontSize": "1rem",
-                    "fontWeight": "600",
-                }),
-            ]
-            return base_stylesheet, info_content
+# Above this many elements the dashboard starts from a server-level overview
+MAX_GRAPH_ELEMENTS = 10000
+# Rows per page of the info panel's server and member lists
+LIST_PAGE_SIZE = 200
+# Similar servers or users shown for the selected node
+SIMILAR_COUNT = 5
 
-        selected_id = clicked_node_data["id"]
-        selected_group = clicked_node_data["group"]
+def graph_element_count(bundle):
+    """Elements create_graph_elements emits: nodes, "Me", membership and connection edges."""
+    return len(bundle.ids) + 1 + len(bundle.indices) + len(bundle.server_rows)
 
-        # Find   nodes
-        connected_nodes = set()
-        connected_edges = set()
+def client_graph_data(bundle, member_counts, stylesheet, selection_stylesheet):
+    """The bundle's labels, adjacency and stats as embedded in the page for the clientside callbacks."""
+    members_indptr, members, member_edges = bundle.server_member_index()
+    return {
+        "ids": list(bundle.ids),
+        "labels": list(bundle.labels),
+        "userCount": bundle.user_count,
+        "indptr": bundle.indptr.tolist(),
+        "indices": bundle.indices.tolist(),
+        "memberIndptr": members_indptr.tolist(),
+        "members": members.tolist(),
+        "memberEdges": member_edges.tolist(),
+        "memberCounts": member_counts.tolist(),
+        "stats": bundle.stats,
+        "stylesheet": stylesheet,
+        "selectionStylesheet": selection_stylesheet,
+    }
 
-        for element in elements:
-            if "source" in element["data"] and "target" in element["data"]:
-                source, target = element["data"]["source"], element["data"]["target"]
-                edge_id = element["data"]["id"]
+def create_app(bundle, max_elements=MAX_GRAPH_ELEMENTS):
+    app = dash.Dash(__name__)
+    app.title = "Discord Connections"
+    stylesheet = create_stylesheet()
+    selection_stylesheet = create_selection_stylesheet()
+    member_counts = bundle.server_user_counts()
+    # Level of detail: large graphs start with servers only, their members
+    # collapsed into one cluster node per server, and a tapped server's
+    # members are drawn on demand within the element budget.
+    level_of_detail = graph_element_count(bundle) > max_elements
 
-                if source == selected_id:
-                    connected_nodes.add(target)
-                    connected_edges.add(edge_id)
-                elif target == selected_id:
-                    connected_nodes.add(source)
-                    connected_edges.add(edge_id)
+    def view_elements(view):
+        elements = create_graph_elements(view)
+        if level_of_detail:
+            elements += create_cluster_elements(view, member_counts - view.server_user_counts())
+        return elements
 
-        # Create highlighting styles
-        highlighting_styles = []
+    def view_data(view):
+        return client_graph_data(view, member_counts, stylesheet, selection_stylesheet)
 
-        # Highlight selected node
-        highlighting_styles.append({
-            "selector": f"node[id = '{selected_id}']",
-            "style": {
-                "border-color": "#FEE75C",
-                "border-width": "6px",
-                "background-color": "#FFEBB3",
-                "color": "#000000",
-                "text-outline-color": "#FEE75C",
-                "z-index": "10",
-            }
-        })
+    view = bundle.subgraph([]) if level_of_detail else bundle
+    app.layout = build_dash_layout(view_elements(view), stylesheet, view_data(view))
 
-        # Highlight connected nodes
-        for node_id in connected_nodes:
-            highlighting_styles.append({
-                "selector": f"node[id = '{node_id}']",
-                "style": {
-                    "border-color": "#FEE75C",
-                    "border-width": "4px",
-                    "z-index": "8",
-                }
-            })
+    # Selection highlighting and the info panel are rendered in the browser by
+    # assets/graph_callbacks.js from the embedded graph data; only the node
+    # list, the analytics panel and server expansion are served by Dash.
+    app.clientside_callback(
+        ClientsideFunction(namespace="discord_graph", function_name="selectNode"),
+        [
+            Output("discord-graph", "stylesheet"),
+            Output("node-info", "children"),
+            Output("discord-graph", "elements"),
+            Output("highlighted-elements", "data"),
+        ],
+        [
+            Input("discord-graph", "tapNodeData"),
+            Input("deselect-button", "n_clicks"),
+            Input("graph-data", "data"),
+        ],
+        State("highlighted-elements", "data"),
+    )
 
-        for edge_id in connected_edges:
-            highlighting_styles.append({
-                "selector": f"edge[id = '{edge_id}']",
-                "style": {
-                    "line-color": "#FEE75C",
-                    "target-arrow-color": "#FEE75C",
-                    "width": "5px",
-                    "opacity": "1",
-                    "z-index": "5",
-                }
-            })
-        all_node_ids = {elem["data"]["id"] for elem in elements if "source" not in elem["data"]}
-        unconnected_nodes = all_node_ids - connected_nodes - {selected_id}
-        for node_id in unconnected_nodes:
-            highlighting_styles.append({
-                "selector": f"node[id = '{node_id}']",
-                "style": {"opacity": "0.3"}
-            })
+    def list_rows(kind, node_id, search):
+        if kind == "user":
+            rows = bundle.neighbors(bundle.node_row(node_id))
+        elif kind == "server":
+            rows = bundle.server_members(bundle.node_row(node_id))
+        else:
+            rows = bundle.server_rows
+        if search:
+            needle = search.casefold()
+            rows = [row for row in rows if needle in bundle.labels[row].casefold()]
+        return rows
 
-        # Create info content based on selected node
-        if selected_group == "user":
-            servers = users_to_servers.get(selected_id, [])
-            info_content = [
-                html.H3(selected_id, style={
-                    "margin": "0 0 1rem 0",
-                    "color": "#3b82f6",
-                    "fontSize": "1.125rem",
-                    "fontWeight": "600",
-                }),
-                html.P(f"Member of {len(servers)} servers:",
-                      style={"margin": "0 0 0.75rem 0", "color": "#f9fafb", "fontSize": "0.875rem", "fontWeight": "500"}),
-                html.Div([
-                    *[html.P(server, style={
-                        "margin": "0 0 0.5rem 0",
-                        "color": "#10b981",
-                        "fontSize": "0.875rem",
-                        "paddingLeft": "0.5rem",
-                    }) for server in servers],
-                ])
-            ]
-        elif selected_group == "server":
-            members = [user for user, servers in users_to_servers.items() if selected_id in servers]
-            info_content = [
-                html.H3(selected_id, style={
-                    "margin": "0 0 1rem 0",
+    def list_item(kind, row):
+        if kind == "servers":
+            return html.Div([
+                html.P(bundle.labels[row], style={
+                    "margin": "0",
                     "color": "#10b981",
-                    "fontSize": "1.125rem",
-                    "fontWeight": "600",
+                    "fontSize": "0.875rem",
+                    "fontWeight": "500",
                 }),
-                html.P(f"{len(members)} members:",
-                      style={"margin": "0 0 0.75rem 0", "color": "#f9fafb", "fontSize": "0.875rem", "fontWeight": "500"}),
-                html.Div([
-                    *[html.P(member, style={
-                        "margin": "0 0 0.5rem 0",
-                        "color": "#3b82f6",
-                        "fontSize": "0.875rem",
-                        "paddingLeft": "0.5rem",
-                    }) for member in members],
-                ])
+                html.P(f"{member_counts[row - bundle.user_count]} members",
+                      style={"margin": "0", "color": "#6b7280", "fontSize": "0.5rem"}),
+            ], style={
+                "padding": "0.5rem",
+                "margin": "0 0 0.5rem 0",
+                "backgroundColor": "#1f2937",
+                "borderRadius": "0.375rem",
+                "border": "1px solid #374151",
+                "cursor": "pointer",
+            })
+        return html.P(bundle.labels[row], style={
+            "margin": "0 0 0.5rem 0",
+            "color": "#3b82f6" if kind == "server" else "#10b981",
+            "fontSize": "0.875rem",
+            "paddingLeft": "0.5rem",
+        })
+
+    @app.callback(
+        [
+            Output("node-list", "children"),
+            Output("list-page-label", "children"),
+            Output("list-controls", "style"),
+            Output("list-state", "data"),
+            Output("list-search", "value"),
+        ],
+        [
+            Input("discord-graph", "tapNodeData"),
+            Input("deselect-button", "n_clicks"),
+            Input("list-search", "value"),
+            Input("list-prev", "n_clicks"),
+            Input("list-next", "n_clicks"),
+        ],
+        State("list-state", "data"),
+    )
+    def update_node_list(clicked_node_data, n_clicks, search, prev_clicks, next_clicks, state):
+        """One page of the selected node's servers or members, read from the bundle's indexes.
+
+        Only LIST_PAGE_SIZE rows are sent per update, however large the server.
+        """
+        triggered = callback_context.triggered_id
+        kind, node_id, page = state["kind"], state["id"], state["page"]
+        if triggered in (None, "discord-graph", "deselect-button"):
+            search = ""
+            page = 0
+            if triggered == "deselect-button":
+                kind = node_id = None
+            elif not clicked_node_data:
+                kind, node_id = "servers", None
+            elif clicked_node_data["group"] in ("user", "server"):
+                kind, node_id = clicked_node_data["group"], clicked_node_data["id"]
+            elif clicked_node_data["group"] == "cluster":
+                kind, node_id = "server", clicked_node_data["server"]
+            else:
+                kind = node_id = None
+        elif triggered == "list-search":
+            page = 0
+        elif triggered == "list-prev":
+            page -= 1
+        elif triggered == "list-next":
+            page += 1
+
+        state = {"kind": kind, "id": node_id, "page": 0}
+        if kind is None:
+            return [], "", {"display": "none"}, state, search
+
+        rows = list_rows(kind, node_id, search)
+        page_count = max(1, -(-len(rows) // LIST_PAGE_SIZE))
+        state["page"] = page = min(max(page, 0), page_count - 1)
+        start = page * LIST_PAGE_SIZE
+        end = min(start + LIST_PAGE_SIZE, len(rows))
+        page_label = f"{start + 1}-{end} of {len(rows)}" if len(rows) else "No matches"
+        items = [list_item(kind, row) for row in rows[start:end]]
+        return items, page_label, {"display": "block"}, state, search
+
+    incidence = incidence_from_bundle(bundle)
+    similar_servers = []
+
+    def similar_item(row, detail):
+        return html.Div([
+            html.P(bundle.labels[row], style={
+                "margin": "0",
+                "color": "#3b82f6" if bundle.is_user(row) else "#10b981",
+                "fontSize": "0.875rem",
+            }),
+            html.P(detail, style={"margin": "0", "color": "#6b7280", "fontSize": "0.75rem"}),
+        ], style={"margin": "0 0 0.5rem 0", "paddingLeft": "0.5rem"})
+
+    @app.callback(
+        Output("node-analytics", "children"),
+        [Input("discord-graph", "tapNodeData"), Input("deselect-button", "n_clicks")],
+    )
+    def update_node_analytics(clicked_node_data, n_clicks):
+        """The servers with the most similar member sets, or the users sharing the most servers."""
+        if callback_context.triggered_id == "deselect-button" or not clicked_node_data:
+            return []
+        group = clicked_node_data["group"]
+        if group == "user":
+            row = bundle.node_row(clicked_node_data["id"])
+            users, counts = top_comembers(incidence, SIMILAR_COUNT, rows=[row])[0]
+            title = "Shares the most servers with"
+            items = [similar_item(user, f"{int(count)} shared servers") for user, count in zip(users, counts)]
+        elif group in ("server", "cluster"):
+            if not similar_servers:
+                similar_servers.extend(top_similar_servers(incidence, SIMILAR_COUNT))
+            row = bundle.node_row(clicked_node_data.get("server", clicked_node_data["id"]))
+            servers, scores, shared = similar_servers[row - bundle.user_count]
+            title = "Most similar servers"
+            items = [
+                similar_item(bundle.user_count + server, f"{int(count)} shared members, {score:.0%} overlap")
+                for server, score, count in zip(servers, scores, shared)
             ]
         else:
-            total_servers = len({srv for lst in users_to_servers.values() for srv in lst})
-            total_users = len(users_to_servers)
-            info_content = [
-                html.H3("You", style={
-                    "margin": "0 0 1rem 0",
-                    "color": "#ef4444",
-                    "fontSize": "1.125rem",
-                    "fontWeight": "600",
-                }),
-                html.P(f"Connected to {total_servers} users through {total_users} servers",
-                      style={"margin": "0 0 0.75rem 0", "color": "#f9fafb", "fontSize": "0.875rem"}),
-                html.P("Your network reach in Discord",
-                      style={"margin": "0", "color": "#9ca3af", "fontSize": "0.875rem", "fontStyle": "italic"}),
-            ]
-        return base_stylesheet + highlighting_styles, info_content
+            return []
+        if not items:
+            return []
+        return [
+            html.P(title, style={
+                "margin": "0 0 0.75rem 0",
+                "color": "#f9fafb",
+                "fontSize": "0.875rem",
+                "fontWeight": "500",
+            }),
+            *items,
+            html.Hr(style={"border": "none", "borderTop": "1px solid #374151", "margin": "1rem 0"}),
+        ]
+
+    if level_of_detail:
+        member_budget = max_elements - len(view_elements(view))
+        if member_budget < 0:
+            logging.warning(
+                f"The server-level view alone exceeds the {max_elements} element budget; "
+                "expanded servers will show no members"
+            )
+            member_budget = 0
+
+        # Only the expanded server's id is sent with each tap, not the graph data
+        @app.callback(
+            [
+                Output("discord-graph", "elements", allow_duplicate=True),
+                Output("graph-data", "data"),
+                Output("expanded-server", "data"),
+            ],
+            Input("discord-graph", "tapNodeData"),
+            State("expanded-server", "data"),
+            prevent_initial_call=True,
+        )
+        def expand_server(clicked_node_data, expanded):
+            """Draw the tapped server's members, as many as fit in the element budget."""
+            if not clicked_node_data or clicked_node_data["group"] not in ("server", "cluster"):
+                raise PreventUpdate
+            server_id = clicked_node_data.get("server", clicked_node_data["id"])
+            if server_id == expanded:
+                raise PreventUpdate
+            members = bundle.server_members(bundle.node_row(server_id))
+            # A member costs its node plus an edge to each of its servers
+            costs = np.cumsum(1 + bundle.indptr[members + 1] - bundle.indptr[members])
+            shown = members[:np.searchsorted(costs, member_budget, side="right")]
+            view = bundle.subgraph(shown)
+            logging.info(f"Expanded {len(shown)}/{len(members)} members of {server_id}")
+            return view_elements(view), view_data(view), server_id
 
     return app
 
-def run_web_server(users_to_servers, debug=False):
-    app = create_app(users_to_servers)
+def run_web_server(bundle, debug=False, max_elements=MAX_GRAPH_ELEMENTS):
+    app = create_app(bundle, max_elements)
     app.run(debug=debug, host="0.0.0.0", port=8050)
 
 if __name__ == "__main__":
-    import json
     import sys
     json_file = sys.argv[1] if len(sys.argv) > 1 else ''
     if json_file == '':
-        print("Please specify a JSON file to load")
+        print("Please specify a JSON file or snapshot directory to load")
         exit(0)
 
-    with open(json_file, 'r') as f:
-        mutual_servers = json.load(f)
-    users_to_servers = remap_servers_to_adjacency_matrix(mutual_servers)
-    run_web_server(users_to_servers, debug=False)
+    run_web_server(load_dashboard(json_file), debug=False)